@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 """Analyze STL to find correct WGS84 mapping"""
 import numpy as np
-from stl import mesh
+
+from calibration_common import load_stl_vectors
 
 print("Loading STL...")
-stl_mesh = mesh.Mesh.from_file('../sg-building-binary.stl')
-vertices = stl_mesh.vectors.reshape(-1, 3)
-triangles = stl_mesh.vectors
-centroids = np.mean(triangles, axis=1)
+triangles = load_stl_vectors('../sg-building-binary.stl')
+vertices = triangles.reshape(-1, 3)
+# Sum the three contiguous vertex columns rather than reducing along the
+# strided middle axis with mean(axis=1)
+centroids = (triangles[:, 0, :] + triangles[:, 1, :] + triangles[:, 2, :]) * (1.0 / 3.0)
 
 print(f"\nSTL Statistics:")
 print(f"  Total triangles: {len(triangles)}")
@@ -26,12 +28,8 @@ min_y, max_y = np.min(centroids[:,1]), np.max(centroids[:,1])
 x_edges = np.linspace(min_x, max_x, grid_size + 1)
 y_edges = np.linspace(min_y, max_y, grid_size + 1)
 
-density_grid = np.zeros((grid_size, grid_size))
-for i in range(grid_size):
-    for j in range(grid_size):
-        mask = ((centroids[:,0] >= x_edges[i]) & (centroids[:,0] < x_edges[i+1]) &
-                (centroids[:,1] >= y_edges[j]) & (centroids[:,1] < y_edges[j+1]))
-        density_grid[j, i] = np.sum(mask)
+# Single C-level pass instead of one boolean mask per grid cell
+density_grid, _, _ = np.histogram2d(centroids[:,1], centroids[:,0], bins=[y_edges, x_edges])
 
 # Find top 5 density cells
 flat_indices = np.argsort(density_grid.flatten())[::-1][:5]
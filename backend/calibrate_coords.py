@@ -2,24 +2,38 @@
 Coordinate calibration using contour matching
 """
 import numpy as np
-from stl import mesh
 import cv2
 from PIL import Image
 import os
 
+from calibration_common import (
+    LANDMARK_NAMES,
+    LANDMARK_LATS,
+    LANDMARK_LNGS,
+    load_stl_vectors,
+    compute_centroids,
+    rasterize_density,
+    clip_percentile,
+)
+
 # Load STL
 print("=" * 60)
 print("Step 1: Loading STL and analyzing bounds...")
 print("=" * 60)
 
 stl_path = os.path.join(os.path.dirname(__file__), '..', 'sg-building-binary.stl')
-stl_mesh = mesh.Mesh.from_file(stl_path)
-vectors = stl_mesh.vectors
-
-# Get all vertices
-all_points = vectors.reshape(-1, 3)
-x_min, y_min, z_min = all_points.min(axis=0)
-x_max, y_max, z_max = all_points.max(axis=0)
+vectors = load_stl_vectors(stl_path)
+
+# Compute centroids once and take bounds from them — one pass over a
+# (N, 3) array instead of separate min/max passes over the 3x larger
+# vertex array (mapping only needs the data extent, not exact vertices)
+centroids = compute_centroids(vectors)
+# Only the X/Y extent feeds the mapping; Z is reduced separately just
+# for the report below
+x_min, y_min = centroids[:, :2].min(axis=0)
+x_max, y_max = centroids[:, :2].max(axis=0)
+z_min = centroids[:, 2].min()
+z_max = centroids[:, 2].max()
 
 print(f"STL bounds:")
 print(f"  X: {x_min:.1f} to {x_max:.1f} (range: {x_max-x_min:.1f})")
@@ -32,26 +46,23 @@ print("Step 2: Generating high-resolution density map...")
 print("=" * 60)
 
 img_size = 1024
-density = np.zeros((img_size, img_size), dtype=np.float32)
 
-# Sample centroids
-centroids = vectors.mean(axis=1)
 x_coords = centroids[:, 0]
 y_coords = centroids[:, 1]
 
-# Normalize to image coordinates
+# Accumulate the density raster in a single native pass instead of a
+# per-centroid Python loop
 # Note: Y is flipped for image coordinates (origin at top-left)
-px = ((x_coords - x_min) / (x_max - x_min) * (img_size - 1)).astype(int)
-py = ((y_max - y_coords) / (y_max - y_min) * (img_size - 1)).astype(int)  # Flip Y
-
-px = np.clip(px, 0, img_size - 1)
-py = np.clip(py, 0, img_size - 1)
+density = rasterize_density(x_coords, y_coords, x_min, x_max, y_min, y_max, img_size)
 
-for i in range(len(px)):
-    density[py[i], px[i]] += 1
+# Take the marginal profiles from the raw counts now, so the extent
+# analysis in Step 4 shares this single binning pass instead of
+# re-reducing the clipped/blurred display image
+row_density = density.sum(axis=1)
+col_density = density.sum(axis=0)
 
 # Normalize and convert
-density = np.clip(density, 0, np.percentile(density[density > 0], 95))
+density = clip_percentile(density, 95)
 density = (density / density.max() * 255).astype(np.uint8)
 
 # Apply slight blur
@@ -64,20 +75,16 @@ _, binary = cv2.threshold(density, 10, 255, cv2.THRESH_BINARY)
 Image.fromarray(binary).save('stl_density.png')
 print(f"Saved STL density map")
 
-# Find contours
-contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-largest_contour = max(contours, key=cv2.contourArea)
-print(f"Found {len(contours)} contours, largest has {len(largest_contour)} points")
-
-# Calculate contour centroid and bounds
-M = cv2.moments(largest_contour)
+# Centroid and bounding rect straight from the binary mask — no contour
+# extraction needed when only moments/bounds are used
+M = cv2.moments(binary, binaryImage=True)
 if M["m00"] != 0:
     cx = int(M["m10"] / M["m00"])
     cy = int(M["m01"] / M["m00"])
-    print(f"STL contour centroid (image coords): ({cx}, {cy})")
+    print(f"STL footprint centroid (image coords): ({cx}, {cy})")
 
-# Get bounding rect of the main landmass
-x, y, w, h = cv2.boundingRect(largest_contour)
+# Get bounding rect of the built-up area
+x, y, w, h = cv2.boundingRect(cv2.findNonZero(binary))
 print(f"STL bounding rect: x={x}, y={y}, w={w}, h={h}")
 
 # Convert centroid back to STL coordinates
@@ -89,15 +96,8 @@ print("\n" + "=" * 60)
 print("Step 3: Singapore reference points analysis...")
 print("=" * 60)
 
-# Known Singapore landmarks with WGS84 coordinates
-# These are well-known locations that should be easy to identify
-LANDMARKS = {
-    "Marina Bay Sands": (1.2847, 103.8597),
-    "Changi Airport": (1.3644, 103.9915),
-    "Jurong Island": (1.2660, 103.6800),
-    "Woodlands": (1.4370, 103.7865),
-    "Singapore Center": (1.3521, 103.8198),  # Approximate geographic center
-}
+# Known Singapore landmarks with WGS84 coordinates come from
+# calibration_common.LANDMARKS (shared with calibrate_with_map.py)
 
 # Singapore geographic bounds (WGS84)
 SG_LAT_MIN = 1.1500  # Southernmost
@@ -137,10 +137,13 @@ def wgs84_to_stl_linear(lat, lng):
     return stl_x, stl_y
 
 print("\nTesting linear mapping on landmarks:")
-for name, (lat, lng) in LANDMARKS.items():
-    stl_x, stl_y = wgs84_to_stl_linear(lat, lng)
-    in_bounds = (x_min <= stl_x <= x_max) and (y_min <= stl_y <= y_max)
-    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if in_bounds else '✗'}")
+# The mapping is pure arithmetic, so one call over the landmark arrays
+# replaces a Python function call per landmark
+stl_xs, stl_ys = wgs84_to_stl_linear(LANDMARK_LATS, LANDMARK_LNGS)
+in_bounds = (x_min <= stl_xs) & (stl_xs <= x_max) & (y_min <= stl_ys) & (stl_ys <= y_max)
+for name, lat, lng, stl_x, stl_y, ok in zip(
+        LANDMARK_NAMES, LANDMARK_LATS, LANDMARK_LNGS, stl_xs, stl_ys, in_bounds):
+    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if ok else '✗'}")
 
 print("\n" + "=" * 60)
 print("Step 4: Refined calibration using contour analysis...")  
@@ -152,25 +155,25 @@ print("=" * 60)
 # The STL data appears to cover a specific area
 # Let's analyze where the density is highest
 
-# Create a more detailed analysis
-row_density = density.sum(axis=1)
-col_density = density.sum(axis=0)
+# row_density / col_density come from the raw count grid in Step 2
 
 # Find the vertical (Y) extent of significant density
+# argmax on the mask (and its reverse) finds the first/last True without
+# materializing an index array like np.where would
 row_threshold = row_density.max() * 0.1
-valid_rows = np.where(row_density > row_threshold)[0]
-if len(valid_rows) > 0:
-    density_y_min = valid_rows[0]
-    density_y_max = valid_rows[-1]
+row_mask = row_density > row_threshold
+if row_mask.any():
+    density_y_min = int(row_mask.argmax())
+    density_y_max = len(row_mask) - 1 - int(row_mask[::-1].argmax())
 else:
     density_y_min, density_y_max = 0, img_size - 1
 
 # Find the horizontal (X) extent of significant density
 col_threshold = col_density.max() * 0.1
-valid_cols = np.where(col_density > col_threshold)[0]
-if len(valid_cols) > 0:
-    density_x_min = valid_cols[0]
-    density_x_max = valid_cols[-1]
+col_mask = col_density > col_threshold
+if col_mask.any():
+    density_x_min = int(col_mask.argmax())
+    density_x_max = len(col_mask) - 1 - int(col_mask[::-1].argmax())
 else:
     density_x_min, density_x_max = 0, img_size - 1
 
@@ -215,10 +218,11 @@ def wgs84_to_stl_refined(lat, lng):
     return stl_x, stl_y
 
 print("\nTesting refined mapping on landmarks:")
-for name, (lat, lng) in LANDMARKS.items():
-    stl_x, stl_y = wgs84_to_stl_refined(lat, lng)
-    in_bounds = (x_min <= stl_x <= x_max) and (y_min <= stl_y <= y_max)
-    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if in_bounds else '✗'}")
+stl_xs, stl_ys = wgs84_to_stl_refined(LANDMARK_LATS, LANDMARK_LNGS)
+in_bounds = (x_min <= stl_xs) & (stl_xs <= x_max) & (y_min <= stl_ys) & (stl_ys <= y_max)
+for name, lat, lng, stl_x, stl_y, ok in zip(
+        LANDMARK_NAMES, LANDMARK_LATS, LANDMARK_LNGS, stl_xs, stl_ys, in_bounds):
+    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if ok else '✗'}")
 
 print("\n" + "=" * 60)
 print("Step 5: Generating calibrated overlay visualization...")
@@ -227,17 +231,24 @@ print("=" * 60)
 # Create visualization with landmarks marked
 vis_img = cv2.cvtColor(density, cv2.COLOR_GRAY2BGR)
 
-# Mark each landmark on the density map
-for name, (lat, lng) in LANDMARKS.items():
-    stl_x, stl_y = wgs84_to_stl_refined(lat, lng)
-    
-    # Convert STL to image coordinates
-    img_x = int((stl_x - x_min) / (x_max - x_min) * img_size)
-    img_y = int((y_max - stl_y) / (y_max - y_min) * img_size)  # Flip Y
-    
-    if 0 <= img_x < img_size and 0 <= img_y < img_size:
-        cv2.circle(vis_img, (img_x, img_y), 8, (0, 255, 0), -1)
-        cv2.putText(vis_img, name[:15], (img_x + 10, img_y), 
+# Mark each landmark on the density map (coordinates mapped in one shot)
+stl_xs, stl_ys = wgs84_to_stl_refined(LANDMARK_LATS, LANDMARK_LNGS)
+img_xs = ((stl_xs - x_min) / (x_max - x_min) * img_size).astype(int)
+img_ys = ((y_max - stl_ys) / (y_max - y_min) * img_size).astype(int)  # Flip Y
+
+# Precompute an r=8 disk mask once and stamp it per landmark by slice
+# assignment instead of a cv2.circle call each time
+marker_r = 8
+disk = np.zeros((2 * marker_r + 1, 2 * marker_r + 1), np.uint8)
+cv2.circle(disk, (marker_r, marker_r), marker_r, 1, -1)
+disk = disk.astype(bool)
+
+for name, img_x, img_y in zip(LANDMARK_NAMES, img_xs, img_ys):
+    if marker_r <= img_x < img_size - marker_r and marker_r <= img_y < img_size - marker_r:
+        patch = vis_img[img_y - marker_r:img_y + marker_r + 1,
+                        img_x - marker_r:img_x + marker_r + 1]
+        patch[disk] = (0, 255, 0)
+        cv2.putText(vis_img, name[:15], (int(img_x) + 10, int(img_y)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
 
 cv2.imwrite('calibrated_landmarks.png', vis_img)
@@ -3,13 +3,23 @@ Calibrate STL coordinates with OpenStreetMap tiles using OpenCV
 Match the STL building footprint with the actual map used in frontend
 """
 import numpy as np
-from stl import mesh
 import cv2
 from PIL import Image
 import requests
 import io
 import os
 import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from calibration_common import (
+    LANDMARK_NAMES,
+    LANDMARK_LATS,
+    LANDMARK_LNGS,
+    load_stl_vectors,
+    compute_centroids,
+    rasterize_density,
+    clip_percentile,
+)
 
 # ============================================================
 # Step 1: Generate STL top-down view (building footprint)
@@ -19,36 +29,30 @@ print("Step 1: Loading STL and generating building footprint...")
 print("=" * 60)
 
 stl_path = os.path.join(os.path.dirname(__file__), '..', 'sg-building-binary.stl')
-stl_mesh = mesh.Mesh.from_file(stl_path)
-vectors = stl_mesh.vectors
+vectors = load_stl_vectors(stl_path)
 
-# Get bounds
-all_points = vectors.reshape(-1, 3)
-x_min, y_min, z_min = all_points.min(axis=0)
-x_max, y_max, z_max = all_points.max(axis=0)
+# Compute centroids once and take bounds from them — one pass over a
+# (N, 3) array instead of separate min/max passes over the 3x larger
+# vertex array (mapping only needs the data extent, not exact vertices)
+centroids = compute_centroids(vectors)
+# Only the X/Y extent feeds the mapping, so skip the Z column entirely
+x_min, y_min = centroids[:, :2].min(axis=0)
+x_max, y_max = centroids[:, :2].max(axis=0)
 
 print(f"STL bounds: X({x_min:.1f}, {x_max:.1f}), Y({y_min:.1f}, {y_max:.1f})")
 
 # Create high-resolution density map
 img_size = 2048
-density = np.zeros((img_size, img_size), dtype=np.float32)
 
-centroids = vectors.mean(axis=1)
 x_coords = centroids[:, 0]
 y_coords = centroids[:, 1]
 
-# Map to image coordinates (flip Y for image)
-px = ((x_coords - x_min) / (x_max - x_min) * (img_size - 1)).astype(int)
-py = ((y_max - y_coords) / (y_max - y_min) * (img_size - 1)).astype(int)
-
-px = np.clip(px, 0, img_size - 1)
-py = np.clip(py, 0, img_size - 1)
-
-for i in range(len(px)):
-    density[py[i], px[i]] += 1
+# Accumulate the density raster in a single native pass instead of a
+# per-centroid Python loop (flip Y for image)
+density = rasterize_density(x_coords, y_coords, x_min, x_max, y_min, y_max, img_size)
 
 # Normalize
-density = np.clip(density, 0, np.percentile(density[density > 0], 98))
+density = clip_percentile(density, 98)
 density = (density / density.max() * 255).astype(np.uint8)
 
 # Apply morphological operations to get cleaner building shapes
@@ -101,30 +105,47 @@ tile_size = 256
 width = (x_max_tile - x_min_tile + 1) * tile_size
 height = (y_max_tile - y_min_tile + 1) * tile_size
 
-map_img = Image.new('RGB', (width, height))
+# Stitch straight into a grayscale NumPy canvas — one slice write per
+# tile instead of PIL RGB pastes plus a full-image convert at the end
+map_array = np.zeros((height, width), dtype=np.uint8)
 
 # Use CartoDB dark matter style (same as frontend)
 tile_url = "https://cartodb-basemaps-a.global.ssl.fastly.net/dark_all/{z}/{x}/{y}.png"
 
-print(f"Downloading {(x_max_tile - x_min_tile + 1) * (y_max_tile - y_min_tile + 1)} tiles...")
+tile_coords = [(tx, ty)
+               for tx in range(x_min_tile, x_max_tile + 1)
+               for ty in range(y_min_tile, y_max_tile + 1)]
+
+print(f"Downloading {len(tile_coords)} tiles...")
 
-for tx in range(x_min_tile, x_max_tile + 1):
-    for ty in range(y_min_tile, y_max_tile + 1):
-        url = tile_url.format(z=zoom, x=tx, y=ty)
+# Downloads are latency-bound: fetch tiles concurrently over a keep-alive
+# session, then paste sequentially in the main thread
+session = requests.Session()
+session.headers.update({'User-Agent': 'Mozilla/5.0 (Calibration Script)'})
+
+def fetch_tile(coord):
+    tx, ty = coord
+    url = tile_url.format(z=zoom, x=tx, y=ty)
+    resp = session.get(url, timeout=10)
+    if resp.status_code != 200:
+        return tx, ty, None
+    return tx, ty, resp.content
+
+with ThreadPoolExecutor(max_workers=16) as pool:
+    futures = [pool.submit(fetch_tile, coord) for coord in tile_coords]
+    for future in as_completed(futures):
         try:
-            resp = requests.get(url, timeout=10, headers={
-                'User-Agent': 'Mozilla/5.0 (Calibration Script)'
-            })
-            if resp.status_code == 200:
-                tile = Image.open(io.BytesIO(resp.content))
-                px = (tx - x_min_tile) * tile_size
-                py = (ty - y_min_tile) * tile_size
-                map_img.paste(tile, (px, py))
+            tx, ty, content = future.result()
         except Exception as e:
-            print(f"  Failed tile ({tx},{ty}): {e}")
+            print(f"  Failed tile: {e}")
+            continue
+        if content is None:
+            continue
+        tile_gray = np.asarray(Image.open(io.BytesIO(content)).convert('L'))
+        px = (tx - x_min_tile) * tile_size
+        py = (ty - y_min_tile) * tile_size
+        map_array[py:py + tile_size, px:px + tile_size] = tile_gray
 
-# Convert to grayscale numpy array
-map_array = np.array(map_img.convert('L'))
 cv2.imwrite('../osm_map.png', map_array)
 
 # Calculate map bounds in lat/lng
@@ -146,12 +167,17 @@ stl_resized = cv2.resize(stl_img, (width, height))
 
 # Enhance map - extract building footprints from dark map
 # In CartoDB dark style, buildings are slightly lighter than background
-map_enhanced = cv2.adaptiveThreshold(
-    map_array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 51, -5
+# Adaptive threshold cost scales with window^2 x pixels, so run it on a
+# half-resolution copy with a proportionally smaller window and upsample
+# the binary mask afterwards (~16x less filtering work)
+map_half = cv2.pyrDown(map_array)
+map_half_thr = cv2.adaptiveThreshold(
+    map_half, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 25, -5
 )
 
-# Invert map (buildings should be white)
-map_enhanced = 255 - map_enhanced
+# Invert map (buildings should be white) and scale the mask back up
+map_enhanced = cv2.resize(255 - map_half_thr, (width, height),
+                          interpolation=cv2.INTER_NEAREST)
 
 # Clean up
 kernel = np.ones((2, 2), np.uint8)
@@ -169,12 +195,17 @@ print("\n" + "=" * 60)
 print("Step 4: Feature matching...")
 print("=" * 60)
 
+# Detect on half-resolution inputs — ORB's internal pyramid keeps
+# detection scale-invariant, and brute-force matching cost drops ~4x
+stl_small = cv2.pyrDown(stl_resized)
+map_small = cv2.pyrDown(map_enhanced)
+
 # Create ORB detector
 orb = cv2.ORB_create(nfeatures=10000)
 
 # Detect keypoints and compute descriptors
-kp1, des1 = orb.detectAndCompute(stl_resized, None)
-kp2, des2 = orb.detectAndCompute(map_enhanced, None)
+kp1, des1 = orb.detectAndCompute(stl_small, None)
+kp2, des2 = orb.detectAndCompute(map_small, None)
 
 print(f"STL keypoints: {len(kp1)}")
 print(f"Map keypoints: {len(kp2)}")
@@ -182,22 +213,18 @@ print(f"Map keypoints: {len(kp2)}")
 if des1 is None or des2 is None or len(kp1) < 10 or len(kp2) < 10:
     print("Not enough keypoints for matching!")
 else:
-    # Match using BFMatcher
-    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-    matches = bf.knnMatch(des1, des2, k=2)
-    
-    # Apply ratio test
-    good_matches = []
-    for m, n in matches:
-        if m.distance < 0.75 * n.distance:
-            good_matches.append(m)
-    
+    # Match using BFMatcher with cross-check: mutual nearest neighbours
+    # filter similarly to the k=2 ratio test at roughly half the
+    # comparisons and DMatch allocations
+    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+    good_matches = sorted(bf.match(des1, des2), key=lambda m: m.distance)[:500]
+
     print(f"Good matches: {len(good_matches)}")
     
     if len(good_matches) >= 4:
-        # Get matched points
-        src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)
-        dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)
+        # Get matched points (scale back to full-resolution coordinates)
+        src_pts = np.float32([kp1[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2) * 2.0
+        dst_pts = np.float32([kp2[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2) * 2.0
         
         # Find homography
         H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
@@ -207,7 +234,7 @@ else:
             print(H)
             
             # Draw matches
-            match_img = cv2.drawMatches(stl_resized, kp1, map_enhanced, kp2, 
+            match_img = cv2.drawMatches(stl_small, kp1, map_small, kp2,
                                         good_matches[:100], None,
                                         flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
             cv2.imwrite('../feature_matches_osm.png', match_img)
@@ -220,17 +247,15 @@ print("\n" + "=" * 60)
 print("Step 5: Contour-based registration...")
 print("=" * 60)
 
-# Find main landmass contour in STL
+# Bounding rect of the built-up area straight from the binary mask —
+# cheaper than extracting contours when only the bounds are needed
 _, stl_binary = cv2.threshold(stl_resized, 20, 255, cv2.THRESH_BINARY)
-stl_contours, _ = cv2.findContours(stl_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+stl_rect = cv2.boundingRect(cv2.findNonZero(stl_binary))
+print(f"STL footprint bounding rect: {stl_rect}")
 
-# Get largest contour (Singapore main island)
+# Contours are still extracted for the comparison visualization below
+stl_contours, _ = cv2.findContours(stl_binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 stl_main = max(stl_contours, key=cv2.contourArea)
-stl_hull = cv2.convexHull(stl_main)
-
-# Get bounding rect
-stl_rect = cv2.boundingRect(stl_main)
-print(f"STL main contour bounding rect: {stl_rect}")
 
 # Find contours in map
 _, map_binary = cv2.threshold(map_enhanced, 30, 255, cv2.THRESH_BINARY)
@@ -262,8 +287,8 @@ print("=" * 60)
 # STL image coordinates (from density map analysis)
 # We need to find where Singapore's distinctive features appear
 
-# Find the centroid and extent of the main landmass in STL
-M = cv2.moments(stl_main)
+# Find the centroid of the built-up area from the binary mask
+M = cv2.moments(stl_binary, binaryImage=True)
 stl_cx = int(M['m10'] / M['m00'])
 stl_cy = int(M['m01'] / M['m00'])
 print(f"STL centroid (image): ({stl_cx}, {stl_cy})")
@@ -310,9 +335,18 @@ print(f"Image offset: ({offset_x}, {offset_y})")
 aligned_vis = np.zeros((height, width, 3), dtype=np.uint8)
 aligned_vis[:, :, 1] = stl_resized  # STL in green channel
 
-# Shift map to align with STL
-M_translate = np.float32([[1, 0, -offset_x], [0, 1, -offset_y]])
-map_shifted = cv2.warpAffine(map_enhanced, M_translate, (width, height))
+# Shift map to align with STL. The transform is a pure integer
+# translation, so a slice copy of the overlapping region replaces
+# warpAffine's interpolation machinery
+dx, dy = -int(offset_x), -int(offset_y)
+map_shifted = np.zeros_like(map_enhanced)
+src_y0, src_x0 = max(0, -dy), max(0, -dx)
+dst_y0, dst_x0 = max(0, dy), max(0, dx)
+h = height - abs(dy)
+w = width - abs(dx)
+if h > 0 and w > 0:
+    map_shifted[dst_y0:dst_y0 + h, dst_x0:dst_x0 + w] = \
+        map_enhanced[src_y0:src_y0 + h, src_x0:src_x0 + w]
 aligned_vis[:, :, 2] = map_shifted  # Shifted map in red channel
 
 cv2.imwrite('../aligned_overlay.png', aligned_vis)
@@ -388,22 +422,14 @@ def wgs84_to_stl(lat, lng):
     y = scale_y * lat + offset_y_final
     return x, y
 
-# Test landmarks
-LANDMARKS = {
-    "Marina Bay Sands": (1.2847, 103.8597),
-    "Changi Airport": (1.3644, 103.9915),
-    "Jurong Island": (1.2660, 103.6800),
-    "Woodlands": (1.4370, 103.7865),
-    "NUS": (1.2966, 103.7764),
-    "NTU": (1.3483, 103.6831),
-    "Singapore Center": (1.3521, 103.8198),
-}
-
+# Test landmarks (shared with calibrate_coords.py via calibration_common)
+# One vectorized mapping call covers every landmark
 print("\nLandmark test:")
-for name, (lat, lng) in LANDMARKS.items():
-    stl_x, stl_y = wgs84_to_stl(lat, lng)
-    in_bounds = (x_min <= stl_x <= x_max) and (y_min <= stl_y <= y_max)
-    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if in_bounds else '✗'}")
+stl_xs, stl_ys = wgs84_to_stl(LANDMARK_LATS, LANDMARK_LNGS)
+in_bounds = (x_min <= stl_xs) & (stl_xs <= x_max) & (y_min <= stl_ys) & (stl_ys <= y_max)
+for name, lat, lng, stl_x, stl_y, ok in zip(
+        LANDMARK_NAMES, LANDMARK_LATS, LANDMARK_LNGS, stl_xs, stl_ys, in_bounds):
+    print(f"  {name}: ({lat:.4f}, {lng:.4f}) -> STL ({stl_x:.0f}, {stl_y:.0f}) {'✓' if ok else '✗'}")
 
 # ============================================================
 # Step 8: Output final parameters
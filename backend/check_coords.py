@@ -4,111 +4,178 @@ import numpy as np
 from stl import mesh
 import math
 
-# Load STL
-print("Loading STL file...")
-stl_mesh = mesh.Mesh.from_file('../sg-building-binary.stl')
-vertices = stl_mesh.vectors.reshape(-1, 3)
+# SVY21 ellipsoid / projection constants, computed once at import so the
+# conversion itself is pure arithmetic
+_A = 6378137.0
+_F = 1 / 298.257223563
 
-min_x, max_x = np.min(vertices[:, 0]), np.max(vertices[:, 0])
-min_y, max_y = np.min(vertices[:, 1]), np.max(vertices[:, 1])
-min_z, max_z = np.min(vertices[:, 2]), np.max(vertices[:, 2])
+# SVY21 origin
+_LNG0 = math.radians(103.833333333333333)  # 103°50'E
+
+# False origin
+_N0 = 38744.572
+_E0 = 28001.642
+_K0 = 1.0
+
+_N = _F / (2 - _F)
+_A_RECT = _A / (1 + _N) * (1 + _N**2/4 + _N**4/64)
+
+# Beta coefficients for inverse
+_BETA1 = _N/2 - 2*_N**2/3 + 37*_N**3/96
+_BETA2 = _N**2/48 + _N**3/15
+_BETA3 = 17*_N**3/480
+
+# Delta coefficients
+_DELTA1 = 2*_N - 2*_N**2/3
+_DELTA2 = 7*_N**2/3 - 8*_N**3/5
+_DELTA3 = 56*_N**3/15
 
-print("\n=== STL Bounds ===")
-print(f"  X: {min_x:.1f} to {max_x:.1f} (range: {max_x - min_x:.1f})")
-print(f"  Y: {min_y:.1f} to {max_y:.1f} (range: {max_y - min_y:.1f})")
-print(f"  Z: {min_z:.1f} to {max_z:.1f} (range: {max_z - min_z:.1f})")
 
 # SVY21 to WGS84 conversion (reverse)
 def svy21_to_wgs84(easting, northing):
-    """Convert SVY21 coordinates to WGS84 lat/lng"""
-    # SVY21 parameters
-    a = 6378137.0
-    f = 1 / 298.257223563
-    
-    # SVY21 origin
-    lat0 = math.radians(1.366666666666667)  # 1°22'N
-    lng0 = math.radians(103.833333333333333)  # 103°50'E
-    
-    # False origin
-    N0 = 38744.572
-    E0 = 28001.642
-    k0 = 1.0
-    
-    e2 = 2 * f - f * f
-    n = f / (2 - f)
-    A = a / (1 + n) * (1 + n**2/4 + n**4/64)
-    
-    # Beta coefficients for inverse
-    beta1 = n/2 - 2*n**2/3 + 37*n**3/96
-    beta2 = n**2/48 + n**3/15
-    beta3 = 17*n**3/480
-    
-    xi = (northing - N0) / (k0 * A)
-    eta = (easting - E0) / (k0 * A)
-    
-    xi_prime = xi - beta1*math.sin(2*xi)*math.cosh(2*eta) - \
-               beta2*math.sin(4*xi)*math.cosh(4*eta) - \
-               beta3*math.sin(6*xi)*math.cosh(6*eta)
-    eta_prime = eta - beta1*math.cos(2*xi)*math.sinh(2*eta) - \
-                beta2*math.cos(4*xi)*math.sinh(4*eta) - \
-                beta3*math.cos(6*xi)*math.sinh(6*eta)
-    
-    chi = math.asin(math.sin(xi_prime) / math.cosh(eta_prime))
-    
-    # Delta coefficients
-    delta1 = 2*n - 2*n**2/3
-    delta2 = 7*n**2/3 - 8*n**3/5
-    delta3 = 56*n**3/15
-    
-    lat = chi + delta1*math.sin(2*chi) + delta2*math.sin(4*chi) + delta3*math.sin(6*chi)
-    lng = lng0 + math.atan(math.sinh(eta_prime) / math.cos(xi_prime))
-    
-    return math.degrees(lat), math.degrees(lng)
-
-print("\n=== Testing if STL uses SVY21 ===")
-# Try converting corners
-corners = [
-    (min_x, min_y, "SW corner"),
-    (max_x, min_y, "SE corner"),
-    (min_x, max_y, "NW corner"),
-    (max_x, max_y, "NE corner"),
-    ((min_x + max_x)/2, (min_y + max_y)/2, "Center"),
-]
-
-print("\nIf STL X=Easting, Y=Northing (SVY21):")
-for x, y, name in corners:
-    try:
-        lat, lng = svy21_to_wgs84(x, y)
+    """Convert SVY21 coordinates to WGS84 lat/lng.
+
+    Accepts scalars or arrays and broadcasts, so a batch of points is
+    one set of ufunc evaluations instead of a Python call per point.
+    """
+    easting = np.asarray(easting, dtype=np.float64)
+    northing = np.asarray(northing, dtype=np.float64)
+
+    xi = (northing - _N0) / (_K0 * _A_RECT)
+    eta = (easting - _E0) / (_K0 * _A_RECT)
+
+    # Clenshaw summation of sum(beta_k * sin(2k*zeta)) over the complex
+    # argument zeta = xi + i*eta: sin(2k*zeta) expands to exactly the
+    # sin*cosh / cos*sinh product pairs of the expanded series, so one
+    # complex sin and cos replace the twelve real transcendental calls
+    zeta = xi + 1j * eta
+    x2 = 2 * np.cos(2 * zeta)
+    b2 = _BETA2 + x2 * _BETA3
+    b1 = _BETA1 + x2 * b2 - _BETA3
+    zeta_prime = zeta - b1 * np.sin(2 * zeta)
+    xi_prime = zeta_prime.real
+    eta_prime = zeta_prime.imag
+
+    # chi and lng share these four values; tan(chi) =
+    # sin(xi') / hypot(cos(xi'), sinh(eta')) expressed through arctan2
+    # avoids the arcsin and its division by cosh(eta')
+    sin_xi = np.sin(xi_prime)
+    cos_xi = np.cos(xi_prime)
+    sinh_eta = np.sinh(eta_prime)
+    chi = np.arctan2(sin_xi, np.hypot(cos_xi, sinh_eta))
+
+    # Same Clenshaw recurrence for the real chi -> lat series
+    x2 = 2 * np.cos(2 * chi)
+    b2 = _DELTA2 + x2 * _DELTA3
+    b1 = _DELTA1 + x2 * b2 - _DELTA3
+    lat = chi + b1 * np.sin(2 * chi)
+    lng = _LNG0 + np.arctan2(sinh_eta, cos_xi)
+
+    return np.degrees(lat), np.degrees(lng)
+
+
+def svy21_to_wgs84_fast(easting, northing):
+    """Truncated SVY21 inverse for visualization-grade accuracy.
+
+    Drops the n^3 series terms (beta3/delta3, ~1e-10 rad over the
+    Singapore extent, far below a screen pixel) so each series is a
+    single Horner step. Use svy21_to_wgs84 where survey accuracy
+    matters, e.g. export clipping.
+    """
+    easting = np.asarray(easting, dtype=np.float64)
+    northing = np.asarray(northing, dtype=np.float64)
+
+    xi = (northing - _N0) / (_K0 * _A_RECT)
+    eta = (easting - _E0) / (_K0 * _A_RECT)
+
+    zeta = xi + 1j * eta
+    b1 = _BETA1 + 2 * np.cos(2 * zeta) * _BETA2
+    zeta_prime = zeta - b1 * np.sin(2 * zeta)
+    xi_prime = zeta_prime.real
+    eta_prime = zeta_prime.imag
+
+    sin_xi = np.sin(xi_prime)
+    cos_xi = np.cos(xi_prime)
+    sinh_eta = np.sinh(eta_prime)
+    chi = np.arctan2(sin_xi, np.hypot(cos_xi, sinh_eta))
+
+    b1 = _DELTA1 + 2 * np.cos(2 * chi) * _DELTA2
+    lat = chi + b1 * np.sin(2 * chi)
+    lng = _LNG0 + np.arctan2(sinh_eta, cos_xi)
+
+    return np.degrees(lat), np.degrees(lng)
+
+
+# The calibration sweeps below only need plotting accuracy; flip this to
+# svy21_to_wgs84 to re-run them with the full series
+SVY21_CONVERTER = svy21_to_wgs84_fast
+
+
+def main():
+    """Run the calibration checks against the global STL."""
+    # Load STL
+    print("Loading STL file...")
+    stl_mesh = mesh.Mesh.from_file('../sg-building-binary.stl')
+    vertices = stl_mesh.vectors.reshape(-1, 3)
+
+    # One pass per reduction over all three axes instead of six
+    # column-strided passes
+    min_x, min_y, min_z = vertices.min(axis=0)
+    max_x, max_y, max_z = vertices.max(axis=0)
+
+    print("\n=== STL Bounds ===")
+    print(f"  X: {min_x:.1f} to {max_x:.1f} (range: {max_x - min_x:.1f})")
+    print(f"  Y: {min_y:.1f} to {max_y:.1f} (range: {max_y - min_y:.1f})")
+    print(f"  Z: {min_z:.1f} to {max_z:.1f} (range: {max_z - min_z:.1f})")
+
+    print("\n=== Testing if STL uses SVY21 ===")
+    # Try converting corners
+    corners = [
+        (min_x, min_y, "SW corner"),
+        (max_x, min_y, "SE corner"),
+        (min_x, max_y, "NW corner"),
+        (max_x, max_y, "NE corner"),
+        ((min_x + max_x)/2, (min_y + max_y)/2, "Center"),
+    ]
+
+    print("\nIf STL X=Easting, Y=Northing (SVY21):")
+    corner_lats, corner_lngs = SVY21_CONVERTER(
+        [x for x, y, name in corners],
+        [y for x, y, name in corners],
+    )
+    for (x, y, name), lat, lng in zip(corners, corner_lats, corner_lngs):
         print(f"  {name}: ({x:.0f}, {y:.0f}) -> lat={lat:.4f}, lng={lng:.4f}")
-    except Exception as e:
-        print(f"  {name}: Error - {e}")
-
-print("\n=== Known Singapore Locations (WGS84) ===")
-known_locations = [
-    ("Marina Bay Sands", 1.2847, 103.8610),
-    ("Orchard Road", 1.3048, 103.8318),
-    ("NUS", 1.2966, 103.7764),
-    ("NTU", 1.3483, 103.6831),
-    ("Changi Airport", 1.3644, 103.9915),
-    ("Woodlands", 1.4382, 103.7890),
-]
-
-for name, lat, lng in known_locations:
-    print(f"  {name}: lat={lat}, lng={lng}")
-
-# Test the simple linear mapping I was using
-print("\n=== Testing Linear Mapping ===")
-sg_lat_min, sg_lat_max = 1.156, 1.472
-sg_lng_min, sg_lng_max = 103.605, 104.044
-
-def wgs84_to_stl_linear(lat, lng):
-    x = min_x + (lng - sg_lng_min) / (sg_lng_max - sg_lng_min) * (max_x - min_x)
-    y = min_y + (lat - sg_lat_min) / (sg_lat_max - sg_lat_min) * (max_y - min_y)
-    return x, y
-
-print("Linear mapping results:")
-for name, lat, lng in known_locations:
-    x, y = wgs84_to_stl_linear(lat, lng)
-    in_bounds = min_x <= x <= max_x and min_y <= y <= max_y
-    status = "✓" if in_bounds else "✗ OUT OF BOUNDS"
-    print(f"  {name}: ({x:.0f}, {y:.0f}) {status}")
+
+    print("\n=== Known Singapore Locations (WGS84) ===")
+    known_locations = [
+        ("Marina Bay Sands", 1.2847, 103.8610),
+        ("Orchard Road", 1.3048, 103.8318),
+        ("NUS", 1.2966, 103.7764),
+        ("NTU", 1.3483, 103.6831),
+        ("Changi Airport", 1.3644, 103.9915),
+        ("Woodlands", 1.4382, 103.7890),
+    ]
+
+    for name, lat, lng in known_locations:
+        print(f"  {name}: lat={lat}, lng={lng}")
+
+    # Test the simple linear mapping I was using
+    print("\n=== Testing Linear Mapping ===")
+    sg_lat_min, sg_lat_max = 1.156, 1.472
+    sg_lng_min, sg_lng_max = 103.605, 104.044
+
+    def wgs84_to_stl_linear(lat, lng):
+        x = min_x + (lng - sg_lng_min) / (sg_lng_max - sg_lng_min) * (max_x - min_x)
+        y = min_y + (lat - sg_lat_min) / (sg_lat_max - sg_lat_min) * (max_y - min_y)
+        return x, y
+
+    print("Linear mapping results:")
+    for name, lat, lng in known_locations:
+        x, y = wgs84_to_stl_linear(lat, lng)
+        in_bounds = min_x <= x <= max_x and min_y <= y <= max_y
+        status = "✓" if in_bounds else "✗ OUT OF BOUNDS"
+        print(f"  {name}: ({x:.0f}, {y:.0f}) {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 Configuration settings for SG 3D Export Backend
 """
 import os
+import re
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -22,6 +23,9 @@ class Settings:
     # Server settings
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    # DEBUG=true runs a single auto-reloading worker for development
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+    WORKERS: int = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
     
     # CORS settings
     # Allow all origins in development, or specify production domains via CORS_ORIGINS env var
@@ -39,5 +43,21 @@ class Settings:
             "*"  # Allow all for development and production
         ]
 
+    # CORSMiddleware compares allow_origins entries as exact strings, so
+    # a pattern like "https://*.vercel.app" never matches and forces the
+    # middleware's slow path on every preflight. Split patterned entries
+    # into a single compiled allow_origin_regex; the bare "*" stays an
+    # exact entry.
+    CORS_ALLOW_ORIGINS: list = []
+    _wildcard_origins: list = []
+    for _origin in CORS_ORIGINS:
+        if "*" in _origin and _origin != "*":
+            _wildcard_origins.append(_origin)
+        else:
+            CORS_ALLOW_ORIGINS.append(_origin)
+    CORS_ORIGIN_REGEX = "|".join(
+        re.escape(o).replace(r"\*", ".*") for o in _wildcard_origins
+    ) or None
+
 
 settings = Settings()
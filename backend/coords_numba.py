@@ -0,0 +1,113 @@
+"""Numba-compiled SVY21 -> WGS84 conversion.
+
+Same series and constants as check_coords.svy21_to_wgs84, compiled to
+native code once per process so dense sweeps avoid NumPy's temporary
+arrays. Falls back to plain NumPy when Numba is not installed.
+"""
+import cmath
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# SVY21 ellipsoid / projection constants
+_A = 6378137.0
+_F = 1 / 298.257223563
+
+_LNG0 = math.radians(103.833333333333333)  # 103°50'E
+
+_N0 = 38744.572
+_E0 = 28001.642
+_K0 = 1.0
+
+_N = _F / (2 - _F)
+_A_RECT = _A / (1 + _N) * (1 + _N**2/4 + _N**4/64)
+
+_BETA1 = _N/2 - 2*_N**2/3 + 37*_N**3/96
+_BETA2 = _N**2/48 + _N**3/15
+_BETA3 = 17*_N**3/480
+
+_DELTA1 = 2*_N - 2*_N**2/3
+_DELTA2 = 7*_N**2/3 - 8*_N**3/5
+_DELTA3 = 56*_N**3/15
+
+
+def _svy21_point(easting, northing):
+    """Scalar SVY21 inverse: Clenshaw series, shared trig values."""
+    xi = (northing - _N0) / (_K0 * _A_RECT)
+    eta = (easting - _E0) / (_K0 * _A_RECT)
+
+    zeta = complex(xi, eta)
+    x2 = 2 * cmath.cos(2 * zeta)
+    b1 = _BETA1 + x2 * (_BETA2 + x2 * _BETA3) - _BETA3
+    zeta_prime = zeta - b1 * cmath.sin(2 * zeta)
+    xi_prime = zeta_prime.real
+    eta_prime = zeta_prime.imag
+
+    sin_xi = math.sin(xi_prime)
+    cos_xi = math.cos(xi_prime)
+    sinh_eta = math.sinh(eta_prime)
+    chi = math.atan2(sin_xi, math.hypot(cos_xi, sinh_eta))
+
+    x2r = 2 * math.cos(2 * chi)
+    b1r = _DELTA1 + x2r * (_DELTA2 + x2r * _DELTA3) - _DELTA3
+    lat = chi + b1r * math.sin(2 * chi)
+    lng = _LNG0 + math.atan2(sinh_eta, cos_xi)
+
+    return math.degrees(lat), math.degrees(lng)
+
+
+if numba is not None:
+    _svy21_point_jit = numba.njit(cache=True)(_svy21_point)
+
+    @numba.njit(cache=True)
+    def _svy21_batch(eastings, northings):
+        lats = np.empty_like(eastings)
+        lngs = np.empty_like(eastings)
+        for i in range(eastings.size):
+            lats[i], lngs[i] = _svy21_point_jit(eastings[i], northings[i])
+        return lats, lngs
+else:
+    _svy21_batch = None
+
+
+def svy21_to_wgs84(easting, northing):
+    """Convert SVY21 coordinates to WGS84 (lat, lng) degree arrays.
+
+    Accepts scalars or 1-D arrays. Uses the compiled batch loop when
+    Numba is available; otherwise evaluates the same series with NumPy
+    ufuncs.
+    """
+    easting = np.atleast_1d(np.asarray(easting, dtype=np.float64))
+    northing = np.atleast_1d(np.asarray(northing, dtype=np.float64))
+
+    if _svy21_batch is not None:
+        return _svy21_batch(np.ascontiguousarray(easting),
+                            np.ascontiguousarray(northing))
+
+    # NumPy fallback: same Clenshaw evaluation over array arguments
+    xi = (northing - _N0) / (_K0 * _A_RECT)
+    eta = (easting - _E0) / (_K0 * _A_RECT)
+
+    zeta = xi + 1j * eta
+    x2 = 2 * np.cos(2 * zeta)
+    b1 = _BETA1 + x2 * (_BETA2 + x2 * _BETA3) - _BETA3
+    zeta_prime = zeta - b1 * np.sin(2 * zeta)
+    xi_prime = zeta_prime.real
+    eta_prime = zeta_prime.imag
+
+    sin_xi = np.sin(xi_prime)
+    cos_xi = np.cos(xi_prime)
+    sinh_eta = np.sinh(eta_prime)
+    chi = np.arctan2(sin_xi, np.hypot(cos_xi, sinh_eta))
+
+    x2 = 2 * np.cos(2 * chi)
+    b1 = _DELTA1 + x2 * (_DELTA2 + x2 * _DELTA3) - _DELTA3
+    lat = chi + b1 * np.sin(2 * chi)
+    lng = _LNG0 + np.arctan2(sinh_eta, cos_xi)
+
+    return np.degrees(lat), np.degrees(lng)
@@ -8,15 +8,28 @@ Provides APIs for:
 - STL file export and download
 """
 import asyncio
+import functools
+import gzip
+import hashlib
+import json
+import shutil
+import itertools
 import uuid
 import io
+from math import cos, radians
+
+import msgpack
+
+import numpy as np
+import orjson
 from typing import Optional
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-import aiofiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from cachetools import TTLCache
 
 from config import settings
 from models import (
@@ -25,7 +38,8 @@ from models import (
     SelectionStatus,
     UrbanInsightResponse,
     ExportJobStatus,
-    SINGAPORE_DISTRICTS
+    SINGAPORE_DISTRICTS,
+    SINGAPORE_DISTRICTS_BY_ID
 )
 from services.gemini_service import get_urban_insight, get_building_analysis
 from services.stl_service import (
@@ -46,22 +60,104 @@ app = FastAPI(
     description="Backend API for Singapore 3D Building Model Export System",
     version="2.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    # orjson serializes the numeric-heavy payloads (buildings, previews,
+    # verify grids) several times faster than stdlib json, and its
+    # OPT_SERIALIZE_NUMPY accepts NumPy arrays without .tolist() copies
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
-# Simple approach: allow all origins for production
-# This is safe for read-only APIs or when authentication is handled separately
+# Exact origins come from settings; wildcard-patterned entries (e.g.
+# Vercel preview domains) are matched via allow_origin_regex since the
+# middleware treats allow_origins entries as literal strings
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins
-    allow_credentials=False,  # Must be False when allow_origins=["*"]
+    allow_origins=settings.CORS_ALLOW_ORIGINS,
+    allow_origin_regex=settings.CORS_ORIGIN_REGEX,
+    allow_credentials=False,  # Must be False when allowing all origins
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# In-memory job storage (use Redis in production)
-export_jobs: dict[str, ExportJobStatus] = {}
+# Compress JSON/GeoJSON payloads (~10:1 on feature collections); small
+# responses and already-encoded or image bodies are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# In-memory job storage (use Redis in production). Bounded with a TTL
+# so abandoned jobs don't accumulate for the life of the process:
+# clients poll for at most a few minutes, an hour is generous.
+export_jobs: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+export_jobs_lock = asyncio.Lock()
+
+
+# Per-district lookup tables, filled in at startup so the stats,
+# download, and preview endpoints resolve their default selection from
+# a table instead of re-scanning the index per request
+DISTRICT_CACHE: dict[str, dict] = {}
+
+
+def _precompute_district_cache():
+    """Resolve bounds, building ids, and stats for every district once."""
+    building_index = get_building_index()
+    for district in SINGAPORE_DISTRICTS:
+        bounds = calculate_bounds(
+            district.lat, district.lng, _radius_for(district.id)
+        )
+        ids = building_index.find_ids_in_bounds(
+            bounds['lat_min'], bounds['lat_max'],
+            bounds['lon_min'], bounds['lon_max']
+        )
+        # Average building STL is about 1-2 KB
+        estimated_size_mb = len(ids) * 1500 / (1024 * 1024)
+        DISTRICT_CACHE[district.id] = {
+            "bounds": bounds,
+            "building_ids": ids,
+            "count": len(ids),
+            "stats": SelectionStats(
+                buildings=len(ids),
+                file_size=f"{estimated_size_mb:.1f} MB",
+                status=SelectionStatus.READY,
+                progress=100
+            ),
+        }
+
+
+# Weak ETag over the current dataset, set once the index is built at
+# startup; the static-ish endpoints below answer 304 against it
+INDEX_ETAG: Optional[str] = None
+
+
+def _compute_index_etag(building_index: BuildingIndex) -> str:
+    """Fingerprint the dataset (row count + CSV mtime/size)."""
+    fingerprint = str(len(building_index.buildings))
+    if building_index.csv_path.exists():
+        stat = building_index.csv_path.stat()
+        fingerprint += f"-{stat.st_mtime}-{stat.st_size}"
+    digest = hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _cache_headers() -> dict:
+    """Cache-Control/ETag headers for dataset-derived responses."""
+    headers = {"Cache-Control": "public, max-age=86400"}
+    if INDEX_ETAG is not None:
+        headers["ETag"] = INDEX_ETAG
+    return headers
+
+
+def _not_modified(request: Request) -> bool:
+    """True when the client already holds the current dataset ETag."""
+    return INDEX_ETAG is not None and request.headers.get("if-none-match") == INDEX_ETAG
+
+
+def _cached_district_buildings(district_id: str) -> Optional[list]:
+    """Buildings for a district's default selection, None if not cached."""
+    cached = DISTRICT_CACHE.get(district_id)
+    if cached is None:
+        return None
+    buildings = get_building_index().buildings
+    return [buildings[i] for i in cached["building_ids"]]
 
 
 # ============================================
@@ -72,16 +168,40 @@ export_jobs: dict[str, ExportJobStatus] = {}
 async def startup_event():
     """Initialize building index on startup."""
     print("🚀 Starting SG 3D Export API...")
+    global INDEX_ETAG
     try:
         # Initialize building index (primary method)
         building_index = get_building_index()
         count = building_index.build_index()
+        INDEX_ETAG = _compute_index_etag(building_index)
         print(f"✅ Building index ready: {count:,} buildings")
         
         stats = building_index.get_stats()
         if stats.get("lat_range"):
             print(f"   Lat range: {stats['lat_range'][0]:.6f} to {stats['lat_range'][1]:.6f}")
             print(f"   Lon range: {stats['lon_range'][0]:.6f} to {stats['lon_range'][1]:.6f}")
+
+        await asyncio.to_thread(_precompute_district_cache)
+        print(f"✅ District cache precomputed for {len(DISTRICT_CACHE)} districts")
+
+        # Pack every building STL into one triangle buffer so district
+        # merges slice memory instead of re-reading thousands of files
+        if await asyncio.to_thread(building_index.preload_triangles):
+            print(f"✅ Triangle buffer ready: {len(building_index._tri_records):,} triangles")
+
+        # Preload the global mesh in a worker thread so the first
+        # preview/export request doesn't pay the multi-second STL parse
+        processor = get_processor()
+        if await asyncio.to_thread(processor.load_mesh):
+            print(f"✅ STL mesh preloaded: {len(processor._mesh.vectors):,} triangles")
+        else:
+            print("⚠️  STL mesh not available; mesh endpoints will return errors")
+
+        # Compress the STL once so downloads can send the ~4x smaller
+        # gzip copy instead of compressing per request (or sending raw)
+        gz_path = await asyncio.to_thread(_ensure_stl_gzip)
+        if gz_path is not None:
+            print(f"✅ Pre-compressed STL ready: {gz_path.stat().st_size / (1024*1024):.1f} MB")
     except Exception as e:
         print(f"❌ Error during startup: {e}")
         import traceback
@@ -110,6 +230,7 @@ async def health_check():
 
 @app.get("/api/buildings/all")
 async def get_all_buildings(
+    request: Request,
     limit: Optional[int] = Query(None, description="Limit number of buildings returned"),
     lat_min: Optional[float] = Query(None, description="Min latitude"),
     lat_max: Optional[float] = Query(None, description="Max latitude"),
@@ -122,38 +243,56 @@ async def get_all_buildings(
     Returns lat, lon, and height for each building.
     Can filter by bounds for viewport-based loading.
     """
+    if _not_modified(request):
+        return Response(status_code=304, headers=_cache_headers())
+
     building_index = get_building_index()
     building_index.ensure_indexed()
     
-    buildings = building_index.buildings
-    
-    # Filter by bounds if provided
-    if all([lat_min, lat_max, lon_min, lon_max]):
-        buildings = [b for b in buildings 
-                    if lat_min <= b.lat <= lat_max and lon_min <= b.lon <= lon_max]
-    
-    # Apply limit if provided
-    if limit and len(buildings) > limit:
-        # Sample evenly
-        step = len(buildings) // limit
-        buildings = buildings[::step][:limit]
-    
-    return {
-        "count": len(buildings),
-        "buildings": [
-            {
-                "lat": b.lat,
-                "lon": b.lon,
-                "height": b.height_m,
-                "id": b.way_code
-            }
-            for b in buildings
-        ]
-    }
+    # Filter by bounds if provided (R-tree query instead of a linear
+    # scan over every building). Compare against None explicitly: a
+    # bound of 0.0 is falsy but perfectly valid, and silently skipping
+    # the filter would serialize the entire dataset
+    if None not in (lat_min, lat_max, lon_min, lon_max):
+        ids = building_index.find_ids_in_bounds(
+            lat_min, lat_max, lon_min, lon_max
+        )
+    else:
+        ids = np.arange(len(building_index.buildings))
+
+    # Apply limit if provided: sample evenly with one integer index
+    # array instead of materializing two intermediate list slices
+    if limit and len(ids) > limit:
+        step = len(ids) // limit
+        ids = ids[np.arange(0, len(ids), step)[:limit]]
+
+    # Gather from the SoA columns; tolist() hands the serializer plain
+    # Python floats/strs in one pass
+    lats = building_index.lats[ids].tolist()
+    lons = building_index.lons[ids].tolist()
+    heights = building_index.heights[ids].tolist()
+    way_codes = building_index.way_codes[ids].tolist()
+
+    return ORJSONResponse(
+        {
+            "count": len(ids),
+            "buildings": [
+                {
+                    "lat": lat,
+                    "lon": lon,
+                    "height": height,
+                    "id": way_code
+                }
+                for lat, lon, height, way_code in zip(lats, lons, heights, way_codes)
+            ]
+        },
+        headers=_cache_headers()
+    )
 
 
 @app.get("/api/buildings/geojson")
 async def get_buildings_geojson(
+    request: Request,
     limit: Optional[int] = Query(50000, description="Limit number of buildings"),
     lat_min: Optional[float] = Query(None),
     lat_max: Optional[float] = Query(None),
@@ -163,48 +302,97 @@ async def get_buildings_geojson(
     """
     Get buildings as GeoJSON for deck.gl visualization.
     """
+    if _not_modified(request):
+        return Response(status_code=304, headers=_cache_headers())
+
     building_index = get_building_index()
     building_index.ensure_indexed()
     
-    buildings = building_index.buildings
-    
-    # Filter by bounds if provided
-    if all([lat_min, lat_max, lon_min, lon_max]):
-        buildings = [b for b in buildings 
-                    if lat_min <= b.lat <= lat_max and lon_min <= b.lon <= lon_max]
+    # Filter by bounds if provided (R-tree query instead of a linear
+    # scan over every building). Compare against None explicitly: a
+    # bound of 0.0 is falsy but perfectly valid, and silently skipping
+    # the filter would serialize the entire dataset
+    if None not in (lat_min, lat_max, lon_min, lon_max):
+        ids = building_index.find_ids_in_bounds(
+            lat_min, lat_max, lon_min, lon_max
+        )
+    else:
+        ids = np.arange(len(building_index.buildings))
     
     # Apply limit
-    if limit and len(buildings) > limit:
-        step = len(buildings) // limit
-        buildings = buildings[::step][:limit]
-    
-    features = []
-    for b in buildings:
-        # Create a small polygon for each building (approximate footprint)
-        # Using ~10m offset for building size
-        offset = 0.00005  # roughly 5m
-        features.append({
-            "type": "Feature",
-            "properties": {
-                "height": b.height_m,  # Height from Z value in filename (meters)
-                "id": b.way_code
-            },
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [[
-                    [b.lon - offset, b.lat - offset],
-                    [b.lon + offset, b.lat - offset],
-                    [b.lon + offset, b.lat + offset],
-                    [b.lon - offset, b.lat + offset],
-                    [b.lon - offset, b.lat - offset]
-                ]]
-            }
-        })
-    
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+    if limit and len(ids) > limit:
+        step = len(ids) // limit
+        ids = ids[::step][:limit]
+
+    # Corner coordinates for every footprint come from four vectorized
+    # array expressions; the loop below only assembles feature dicts
+    # Using ~10m offset for building size
+    offset = 0.00005  # roughly 5m
+    lats = building_index.lats[ids]
+    lons = building_index.lons[ids]
+    heights = building_index.heights[ids]
+    way_codes = building_index.way_codes[ids]
+    lon_lo, lon_hi = lons - offset, lons + offset
+    lat_lo, lat_hi = lats - offset, lats + offset
+
+    # One (n, 5, 2) block holds every closed ring; float32 keeps it
+    # compact and is far more precision than a ~5m footprint needs.
+    # Each feature below slices its ring out of this block and orjson
+    # serializes the array view directly, so no per-corner Python lists
+    # are ever built
+    corners = np.empty((len(ids), 5, 2), dtype=np.float32)
+    corners[:, 0, 0] = lon_lo
+    corners[:, 0, 1] = lat_lo
+    corners[:, 1, 0] = lon_hi
+    corners[:, 1, 1] = lat_lo
+    corners[:, 2, 0] = lon_hi
+    corners[:, 2, 1] = lat_hi
+    corners[:, 3, 0] = lon_lo
+    corners[:, 3, 1] = lat_hi
+    corners[:, 4] = corners[:, 0]
+
+    # Stream the collection in slices so the first features reach the
+    # client while later ones are still being encoded, and no more than
+    # one slice of feature dicts is resident at a time
+    chunk_size = 4096
+
+    async def feature_stream():
+        yield b'{"type":"FeatureCollection","features":['
+        emitted = False
+        for start in range(0, len(ids), chunk_size):
+            sl = slice(start, start + chunk_size)
+            chunk_feats = [
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "height": h,  # Height from Z value in filename (meters)
+                        "id": w
+                    },
+                    "geometry": {
+                        "type": "Polygon",
+                        # ring[None] is the (1, 5, 2) list-of-rings view
+                        "coordinates": ring[None]
+                    }
+                }
+                for h, w, ring in zip(heights[sl], way_codes[sl], corners[sl])
+            ]
+            # orjson encodes the NumPy scalars directly, skipping both
+            # the float() conversions and stdlib json
+            payload = b",".join(
+                orjson.dumps(f, option=orjson.OPT_SERIALIZE_NUMPY)
+                for f in chunk_feats
+            )
+            if payload:
+                yield b"," + payload if emitted else payload
+                emitted = True
+        yield b"]}"
+
+    return StreamingResponse(
+        feature_stream(),
+        media_type="application/geo+json",
+        # Keep proxies from re-buffering the stream back into one blob
+        headers={"X-Accel-Buffering": "no", **_cache_headers()}
+    )
 
 
 # ============================================
@@ -229,7 +417,7 @@ async def get_district(district_id: str):
     Args:
         district_id: The district identifier (1-5)
     """
-    district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+    district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
     if not district:
         raise HTTPException(status_code=404, detail=f"District {district_id} not found")
     return district
@@ -246,41 +434,28 @@ async def get_district_stats(district_id: str):
         district_id: The district identifier
     """
     # Validate district exists
-    district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+    district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
     if not district:
         raise HTTPException(status_code=404, detail=f"District {district_id} not found")
-    
-    # Use default radius for the district
-    radius = DISTRICT_RADIUS.get(district_id, 600)
-    
-    # Calculate rectangular bounds (matches frontend)
-    bounds = calculate_bounds(district.lat, district.lng, radius)
-    
-    # Use building index to find buildings in rectangular bounds
+
+    # Stats for the default radius are precomputed at startup
+    cached = DISTRICT_CACHE.get(district_id)
+    if cached is not None:
+        return cached["stats"]
+
+    # Fallback if startup precomputation did not run (e.g. index error)
+    bounds = calculate_bounds(district.lat, district.lng, _radius_for(district_id))
     building_index = get_building_index()
     buildings = building_index.find_buildings_in_bounds(
         bounds['lat_min'], bounds['lat_max'],
         bounds['lon_min'], bounds['lon_max']
     )
-    
-    if not buildings:
-        return SelectionStats(
-            buildings=0,
-            file_size="0 MB",
-            status=SelectionStatus.READY,
-            progress=100
-        )
-    
-    # Calculate actual statistics
-    building_count = len(buildings)
-    
-    # Estimate file size based on building count and average size
+
     # Average building STL is about 1-2 KB
-    estimated_size_bytes = building_count * 1500
-    estimated_size_mb = estimated_size_bytes / (1024 * 1024)
-    
+    estimated_size_mb = len(buildings) * 1500 / (1024 * 1024)
+
     return SelectionStats(
-        buildings=building_count,
+        buildings=len(buildings),
         file_size=f"{estimated_size_mb:.1f} MB",
         status=SelectionStatus.READY,
         progress=100
@@ -302,7 +477,7 @@ async def get_district_insight(district_id: str):
     Args:
         district_id: The district identifier
     """
-    district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+    district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
     if not district:
         raise HTTPException(status_code=404, detail=f"District {district_id} not found")
     
@@ -345,42 +520,84 @@ async def get_stl_info():
     return await get_stl_file_info()
 
 
+def _ensure_stl_gzip() -> Optional[Path]:
+    """Create (once) and return the pre-compressed copy of the STL.
+
+    Rebuilt only when the source file is newer than the .gz copy.
+    """
+    stl_path = get_stl_file_path()
+    if not stl_path.exists():
+        return None
+
+    gz_path = stl_path.with_suffix(stl_path.suffix + '.gz')
+    if (not gz_path.exists()
+            or gz_path.stat().st_mtime < stl_path.stat().st_mtime):
+        with open(stl_path, 'rb') as src, \
+                gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    return gz_path
+
+
 @app.get("/api/stl/download")
 async def download_stl(
+    request: Request,
     district_id: Optional[str] = Query(None, description="Optional district ID for naming")
 ):
     """
     Download the global STL file.
-    
+
     Returns the sg-building-binary.stl file as a downloadable attachment.
-    
+    Clients that accept gzip get the pre-compressed copy; others get the
+    raw file with full Range support.
+
     Args:
         district_id: Optional district ID for custom filename
     """
     stl_path = get_stl_file_path()
-    
+
     if not stl_path.exists():
         raise HTTPException(
             status_code=404, 
             detail="STL file not found. Please ensure sg-building-binary.stl exists."
         )
-    
+
+    if _not_modified(request):
+        return Response(status_code=304, headers=_cache_headers())
+
     # Determine filename
     if district_id:
-        district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+        district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
         if district:
             filename = f"{district.name.replace(' ', '_')}_SG_3D.stl"
         else:
             filename = f"Singapore_3D_{district_id}.stl"
     else:
         filename = "Singapore_Building_Model.stl"
-    
+
+    # Serve the startup-compressed copy when the client accepts gzip;
+    # STL triangle soup compresses roughly 4x
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if "gzip" in accept_encoding.lower():
+        gz_path = get_stl_file_path().with_suffix(stl_path.suffix + '.gz')
+        if gz_path.exists() and gz_path.stat().st_mtime >= stl_path.stat().st_mtime:
+            return FileResponse(
+                path=gz_path,
+                media_type="application/octet-stream",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{filename}"',
+                    "Content-Encoding": "gzip",
+                    "Vary": "Accept-Encoding",
+                    **_cache_headers()
+                }
+            )
+
     return FileResponse(
         path=stl_path,
         filename=filename,
         media_type="application/octet-stream",
         headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            **_cache_headers()
         }
     )
 
@@ -390,11 +607,10 @@ def calculate_bounds(lat: float, lng: float, radius_meters: float):
     Calculate rectangular bounds from center + radius.
     Matches frontend calculation for consistent selection.
     """
-    import math
     # 1 degree latitude ≈ 111,320 meters
     # 1 degree longitude ≈ 111,320 * cos(lat) meters
     lat_offset = radius_meters / 111320
-    lng_offset = radius_meters / (111320 * math.cos(math.radians(lat)))
+    lng_offset = radius_meters / (111320 * cos(radians(lat)))
     
     return {
         'lat_min': lat - lat_offset,
@@ -415,38 +631,40 @@ async def download_district_stl(district_id: str):
     Args:
         district_id: The district identifier
     """
-    district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+    district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
     if not district:
         raise HTTPException(status_code=404, detail=f"District {district_id} not found")
     
-    # Get radius for district
-    radius = DISTRICT_RADIUS.get(district_id, 600)
-    
-    # Calculate rectangular bounds (matches frontend)
-    bounds = calculate_bounds(district.lat, district.lng, radius)
-    
-    # Use building index to find buildings in rectangular bounds
     building_index = get_building_index()
-    buildings = building_index.find_buildings_in_bounds(
-        bounds['lat_min'], bounds['lat_max'],
-        bounds['lon_min'], bounds['lon_max']
-    )
+
+    # The default selection is resolved at startup; fall back to a
+    # bounds query if the cache is unavailable
+    buildings = _cached_district_buildings(district_id)
+    if buildings is None:
+        bounds = calculate_bounds(district.lat, district.lng, _radius_for(district_id))
+        buildings = building_index.find_buildings_in_bounds(
+            bounds['lat_min'], bounds['lat_max'],
+            bounds['lon_min'], bounds['lon_max']
+        )
     
     print(f"District {district.name}: found {len(buildings)} buildings in bounds")
     
     if not buildings:
         raise HTTPException(status_code=404, detail=f"No buildings found in {district.name}")
     
-    # Merge buildings to STL
-    stl_bytes = building_index.merge_buildings_to_stl(buildings)
-    
-    if not stl_bytes:
+    # Stream the merged STL chunk by chunk instead of assembling it in
+    # memory; the first next() gathers the triangle runs, so it goes to
+    # a worker thread and doubles as the empty-result check
+    stream = building_index.iter_merged_stl(buildings)
+    head = await asyncio.to_thread(next, stream, None)
+
+    if head is None:
         raise HTTPException(status_code=500, detail="Failed to generate STL")
-    
+
     filename = f"{district.name.replace(' ', '_')}_SG_3D.stl"
-    
+
     return StreamingResponse(
-        io.BytesIO(stl_bytes),
+        itertools.chain([head], stream),
         media_type="application/octet-stream",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
@@ -458,43 +676,51 @@ async def download_district_stl(district_id: str):
 
 async def process_export_job(job_id: str, district_id: str):
     """Background task to process export and calculate actual statistics."""
-    district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+    district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
     if not district:
-        if job_id in export_jobs:
-            export_jobs[job_id].status = SelectionStatus.ERROR
+        async with export_jobs_lock:
+            if job_id in export_jobs:
+                export_jobs[job_id].status = SelectionStatus.ERROR
         return
-    
+
     processor = get_processor()
-    if not processor.load_mesh():
-        if job_id in export_jobs:
-            export_jobs[job_id].status = SelectionStatus.ERROR
+    if not await asyncio.to_thread(processor.load_mesh):
+        async with export_jobs_lock:
+            if job_id in export_jobs:
+                export_jobs[job_id].status = SelectionStatus.ERROR
         return
-    
+
     # Get radius for district
-    radius = DISTRICT_RADIUS.get(district_id, 600)
-    
-    # Simulate processing progress
-    for progress in [25, 50, 75]:
-        await asyncio.sleep(0.3)
+    radius = _radius_for(district_id)
+
+    # Clip the mesh in a worker thread so the event loop stays free to
+    # answer status polls while the mask pass runs
+    clipped = await asyncio.to_thread(
+        processor.clip_by_district, district.lat, district.lng, radius
+    )
+    async with export_jobs_lock:
         if job_id in export_jobs:
-            export_jobs[job_id].progress = progress
-    
-    # Clip the mesh
-    clipped = processor.clip_by_district(district.lat, district.lng, radius)
-    
+            export_jobs[job_id].progress = 50
+
     if clipped is None or len(clipped.vectors) == 0:
         # Try larger radius
-        clipped = processor.clip_by_district(district.lat, district.lng, radius * 2)
-    
-    if job_id in export_jobs:
-        if clipped is None or len(clipped.vectors) == 0:
-            export_jobs[job_id].status = SelectionStatus.ERROR
-            export_jobs[job_id].progress = 100
-        else:
-            # Calculate actual file size
-            stl_bytes = processor.mesh_to_binary_stl(clipped)
-            file_size_mb = len(stl_bytes) / (1024 * 1024)
-            
+        clipped = await asyncio.to_thread(
+            processor.clip_by_district, district.lat, district.lng, radius * 2
+        )
+
+    if clipped is None or len(clipped.vectors) == 0:
+        async with export_jobs_lock:
+            if job_id in export_jobs:
+                export_jobs[job_id].status = SelectionStatus.ERROR
+                export_jobs[job_id].progress = 100
+        return
+
+    # Calculate actual file size
+    stl_bytes = await asyncio.to_thread(processor.mesh_to_binary_stl, clipped)
+    file_size_mb = len(stl_bytes) / (1024 * 1024)
+
+    async with export_jobs_lock:
+        if job_id in export_jobs:
             export_jobs[job_id].status = SelectionStatus.READY
             export_jobs[job_id].progress = 100
             export_jobs[job_id].file_size = f"{file_size_mb:.1f} MB"
@@ -518,23 +744,25 @@ async def start_export(
     import traceback
     
     try:
-        district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+        district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
         if not district:
             raise HTTPException(status_code=404, detail=f"District {district_id} not found")
         
         job_id = str(uuid.uuid4())
-        
-        export_jobs[job_id] = ExportJobStatus(
+
+        job = ExportJobStatus(
             job_id=job_id,
             district_id=district_id,
             status=SelectionStatus.PROCESSING,
             progress=0
         )
-        
+        async with export_jobs_lock:
+            export_jobs[job_id] = job
+
         # Always add background task
         background_tasks.add_task(process_export_job, job_id, district_id)
-        
-        return export_jobs[job_id]
+
+        return job
     
     except HTTPException:
         raise
@@ -552,10 +780,19 @@ async def get_export_status(job_id: str):
     Args:
         job_id: The export job identifier
     """
-    if job_id not in export_jobs:
-        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
-    
-    return export_jobs[job_id]
+    async with export_jobs_lock:
+        job = export_jobs.get(job_id)
+
+    if job is None:
+        # Our job IDs are UUIDs we issued; a well-formed UUID that is no
+        # longer present was expired from the TTL cache
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+        raise HTTPException(status_code=410, detail=f"Export job {job_id} has expired")
+
+    return job
 
 
 # ============================================
@@ -591,89 +828,149 @@ async def get_mesh_preview(
     x_end: float = Query(1.0, description="End X percentage (0-1)"),
     y_start: float = Query(0.0, description="Start Y percentage (0-1)"),
     y_end: float = Query(1.0, description="End Y percentage (0-1)"),
-    max_triangles: int = Query(5000, description="Max triangles for preview")
+    max_triangles: int = Query(5000, description="Max triangles for preview"),
+    format: str = Query("json", description="Payload format: json or msgpack")
 ):
     """
     Get a clipped mesh preview for Three.js rendering.
-    
+
     Uses percentage-based bounds (0.0 to 1.0) to select a portion of the mesh.
-    Returns vertices and normals in JSON format.
+    Returns vertices and normals in JSON format, or as MessagePack with
+    raw float32 buffers when format=msgpack (about 4x smaller, and the
+    client wraps them in Float32Array without parsing). Bounds are
+    quantized to two decimals (1% of the mesh extent) so slider
+    scrubbing hits a cache of already serialized previews.
     """
+    key = (
+        round(x_start, 2), round(x_end, 2),
+        round(y_start, 2), round(y_end, 2),
+        max_triangles
+    )
+    if format == "msgpack":
+        return Response(
+            content=_mesh_preview_msgpack(*key),
+            media_type="application/msgpack"
+        )
+    return Response(content=_mesh_preview_json(*key), media_type="application/json")
+
+
+def _mesh_preview_arrays(
+    x_start: float, x_end: float,
+    y_start: float, y_end: float,
+    max_triangles: int
+) -> dict:
+    """Clip and simplify one preview selection into geometry arrays."""
     processor = get_processor()
-    
-    # Clip the mesh
+
     clipped = processor.clip_by_percentage(x_start, x_end, y_start, y_end)
-    
+
     if clipped is None:
         # If no triangles in selection, return full mesh preview
         processor.load_mesh()
-        return processor.mesh_to_json(simplify=True, max_triangles=max_triangles)
-    
-    return processor.mesh_to_json(clipped, simplify=True, max_triangles=max_triangles)
+        return processor.mesh_to_arrays(simplify=True, max_triangles=max_triangles)
+    return processor.mesh_to_arrays(clipped, simplify=True, max_triangles=max_triangles)
+
+
+@functools.lru_cache(maxsize=64)
+def _mesh_preview_json(
+    x_start: float, x_end: float,
+    y_start: float, y_end: float,
+    max_triangles: int
+) -> bytes:
+    """Serialize one preview selection as JSON."""
+    data = _mesh_preview_arrays(x_start, x_end, y_start, y_end, max_triangles)
+    if "error" not in data:
+        data["vertices"] = data["vertices"].flatten().tolist()
+        data["normals"] = data["normals"].flatten().tolist()
+    return json.dumps(data).encode()
+
+
+@functools.lru_cache(maxsize=64)
+def _mesh_preview_msgpack(
+    x_start: float, x_end: float,
+    y_start: float, y_end: float,
+    max_triangles: int
+) -> bytes:
+    """Serialize one preview selection as MessagePack.
+
+    vertices/normals travel as raw little-endian float32 buffers with
+    their dtype and shape alongside, so the client reconstructs typed
+    arrays straight from the bytes.
+    """
+    data = _mesh_preview_arrays(x_start, x_end, y_start, y_end, max_triangles)
+    if "error" not in data:
+        for key in ("vertices", "normals"):
+            arr = data[key]
+            data[key] = {
+                "dtype": "float32",
+                "shape": list(arr.shape),
+                "data": arr.tobytes()
+            }
+    return msgpack.packb(data, use_bin_type=True)
+
+
+# Default radius for each district (in meters), indexed by district ID
+# "1"-"8"; a tuple index is cheaper than a dict probe on the hot paths
+DISTRICT_RADIUS = (
+    600,   # 1: Marina Bay
+    500,   # 2: Orchard
+    800,   # 3: Jurong West
+    700,   # 4: Tampines
+    800,   # 5: Woodlands
+    600,   # 6: One North
+    1200,  # 7: NUS
+    2000,  # 8: NTU
+)
 
 
-# Default radius for each district (in meters)
-DISTRICT_RADIUS = {
-    "1": 600,   # Marina Bay
-    "2": 500,   # Orchard
-    "3": 800,   # Jurong West
-    "4": 700,   # Tampines
-    "5": 800,   # Woodlands
-    "6": 600,   # One North
-    "7": 1200,  # NUS
-    "8": 2000,  # NTU
-}
+def _radius_for(district_id: str) -> int:
+    """Default radius in meters for a district ID; 600 for unknown IDs."""
+    try:
+        index = int(district_id) - 1
+    except ValueError:
+        return 600
+    if 0 <= index < len(DISTRICT_RADIUS):
+        return DISTRICT_RADIUS[index]
+    return 600
 
 
 @app.get("/api/mesh/preview/district/{district_id}")
 async def get_district_mesh_preview(
     district_id: str,
     radius: Optional[float] = Query(None, description="Radius in meters (auto if not specified)"),
-    max_triangles: int = Query(5000, description="Max triangles for preview")
+    max_triangles: int = Query(5000, description="Max triangles for preview"),
+    format: str = Query("json", description="Payload format: json or msgpack")
 ):
     """
     Get mesh preview for a specific district using building index.
-    
+
     Finds buildings within the specified radius around the district center.
     Uses correct Blender->WGS84 coordinate transformation.
-    
+
     Default radius varies by district (e.g., NTU campus needs larger radius).
+    With format=msgpack the geometry travels as raw float32 buffers.
     """
     import traceback
-    
+
     try:
-        district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+        district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
         if not district:
             raise HTTPException(status_code=404, detail=f"District {district_id} not found")
-        
+
         # Use default radius if not specified
         if radius is None:
-            radius = DISTRICT_RADIUS.get(district_id, 600)
-        
-        # Calculate rectangular bounds (matches frontend)
-        bounds = calculate_bounds(district.lat, district.lng, radius)
-        
-        # Use building index to find buildings in rectangular bounds
-        building_index = get_building_index()
-        buildings = building_index.find_buildings_in_bounds(
-            bounds['lat_min'], bounds['lat_max'],
-            bounds['lon_min'], bounds['lon_max']
+            radius = _radius_for(district_id)
+
+        # Previews are deterministic per (district, radius, budget), so
+        # repeats come out of the memo instead of re-reading STL files
+        if format == "msgpack":
+            payload = await asyncio.to_thread(
+                _district_preview_msgpack, district_id, radius, max_triangles
+            )
+            return Response(content=payload, media_type="application/msgpack")
+        return await asyncio.to_thread(
+            _district_preview_data, district_id, radius, max_triangles
         )
-        
-        print(f"Preview for {district.name}: found {len(buildings)} buildings in bounds")
-        
-        if not buildings:
-            return {
-                "error": f"No buildings found near {district.name}",
-                "vertices": [],
-                "normals": [],
-                "triangleCount": 0,
-                "buildingCount": 0,
-                "center": [0, 0, 0],
-                "scale": 1.0
-            }
-        
-        return building_index.get_buildings_preview_data(buildings, max_triangles=max_triangles)
     
     except HTTPException:
         raise
@@ -691,6 +988,67 @@ async def get_district_mesh_preview(
         }
 
 
+def _district_preview_arrays(district_id: str, radius: float, max_triangles: int) -> dict:
+    """Build one district preview selection into geometry arrays."""
+    district = SINGAPORE_DISTRICTS_BY_ID[district_id]
+    building_index = get_building_index()
+
+    # The default selection is already resolved in the district cache
+    buildings = None
+    if radius == _radius_for(district_id):
+        buildings = _cached_district_buildings(district_id)
+    if buildings is None:
+        bounds = calculate_bounds(district.lat, district.lng, radius)
+        buildings = building_index.find_buildings_in_bounds(
+            bounds['lat_min'], bounds['lat_max'],
+            bounds['lon_min'], bounds['lon_max']
+        )
+
+    print(f"Preview for {district.name}: found {len(buildings)} buildings in bounds")
+
+    if not buildings:
+        return {
+            "error": f"No buildings found near {district.name}",
+            "vertices": [],
+            "normals": [],
+            "triangleCount": 0,
+            "buildingCount": 0,
+            "center": [0, 0, 0],
+            "scale": 1.0
+        }
+
+    return building_index.get_buildings_preview_arrays(buildings, max_triangles=max_triangles)
+
+
+@functools.lru_cache(maxsize=32)
+def _district_preview_data(district_id: str, radius: float, max_triangles: int) -> dict:
+    """Build one district preview blob; memoized on its key."""
+    data = _district_preview_arrays(district_id, radius, max_triangles)
+    if isinstance(data["vertices"], np.ndarray):
+        data["vertices"] = data["vertices"].flatten().tolist()
+        data["normals"] = data["normals"].flatten().tolist()
+    return data
+
+
+@functools.lru_cache(maxsize=32)
+def _district_preview_msgpack(district_id: str, radius: float, max_triangles: int) -> bytes:
+    """Serialize one district preview as MessagePack.
+
+    Same float32-buffer envelope as _mesh_preview_msgpack, so the
+    client builds its Float32Arrays straight from the bytes.
+    """
+    data = _district_preview_arrays(district_id, radius, max_triangles)
+    if isinstance(data["vertices"], np.ndarray):
+        for key in ("vertices", "normals"):
+            arr = np.ascontiguousarray(data[key], dtype=np.float32)
+            data[key] = {
+                "dtype": "float32",
+                "shape": list(arr.shape),
+                "data": arr.tobytes()
+            }
+    return msgpack.packb(data, use_bin_type=True)
+
+
 @app.get("/api/mesh/clip/download")
 async def download_clipped_stl(
     x_start: float = Query(0.0),
@@ -704,20 +1062,19 @@ async def download_clipped_stl(
     """
     processor = get_processor()
     clipped = processor.clip_by_percentage(x_start, x_end, y_start, y_end)
-    
+
     if clipped is None:
         raise HTTPException(status_code=404, detail="No geometry in selection")
-    
-    stl_bytes = processor.mesh_to_binary_stl(clipped)
-    
+
     if district_id:
-        district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+        district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
         filename = f"{district.name.replace(' ', '_')}_clipped.stl" if district else f"clipped_{district_id}.stl"
     else:
         filename = "clipped_model.stl"
-    
+
+    # Serialize chunk by chunk instead of building the whole file first
     return StreamingResponse(
-        io.BytesIO(stl_bytes),
+        processor.iter_binary_stl(clipped),
         media_type="application/octet-stream",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
@@ -729,6 +1086,7 @@ async def download_clipped_stl(
 
 @app.get("/api/visualize/topdown")
 async def get_topdown_visualization(
+    request: Request,
     width: int = Query(1000, description="Image width"),
     height: int = Query(800, description="Image height"),
     show_districts: bool = Query(True, description="Mark district locations")
@@ -738,53 +1096,96 @@ async def get_topdown_visualization(
     
     Useful for verifying coordinate mapping against real maps.
     """
+    if _not_modified(request):
+        return Response(status_code=304, headers=_cache_headers())
+
     processor = get_processor()
     if not processor.load_mesh():
         raise HTTPException(status_code=500, detail="Could not load mesh")
-    
-    # Prepare district markers
-    mark_points = []
-    if show_districts:
-        for district in SINGAPORE_DISTRICTS:
-            x, y = processor.wgs84_to_local(district.lat, district.lng)
-            mark_points.append((x, y, district.name))
-    
-    img_bytes = generate_topdown_image(
-        width=width, 
-        height=height, 
-        mark_points=mark_points if mark_points else None
-    )
-    
+
+    # Rendering is deterministic per (size, markers) over a fixed mesh,
+    # so repeats come from the memo; the first render runs off-loop
+    img_bytes = await asyncio.to_thread(_topdown_png, width, height, show_districts)
+
     if img_bytes is None:
         raise HTTPException(status_code=500, detail="Could not generate image")
-    
-    return StreamingResponse(
-        io.BytesIO(img_bytes),
+
+    # The PNG is already a bytes object; a plain Response sends it with
+    # a Content-Length instead of chunking it through BytesIO
+    return Response(
+        content=img_bytes,
         media_type="image/png",
-        headers={"Content-Disposition": "inline; filename=stl_topdown.png"}
+        headers={"Content-Disposition": "inline; filename=stl_topdown.png",
+                 **_cache_headers()}
     )
 
 
+@functools.lru_cache(maxsize=16)
+def _topdown_png(width: int, height: int, show_districts: bool) -> Optional[bytes]:
+    """Render one top-down projection PNG; memoized per key."""
+    processor = get_processor()
+
+    # Prepare district markers with one batched conversion
+    mark_points = None
+    if show_districts:
+        xs, ys = processor.wgs84_to_local_batch(
+            [d.lat for d in SINGAPORE_DISTRICTS],
+            [d.lng for d in SINGAPORE_DISTRICTS],
+        )
+        mark_points = [
+            (x, y, d.name) for x, y, d in zip(xs, ys, SINGAPORE_DISTRICTS)
+        ]
+
+    return generate_topdown_image(width=width, height=height, mark_points=mark_points)
+
+
 @app.get("/api/visualize/heatmap")
 async def get_density_heatmap(
+    request: Request,
     width: int = Query(800, description="Image width"),
     height: int = Query(600, description="Image height")
 ):
     """
     Generate a density heatmap showing building concentration.
     """
-    img_bytes = generate_density_heatmap(width=width, height=height)
-    
+    if _not_modified(request):
+        return Response(status_code=304, headers=_cache_headers())
+
+    # Heatmaps re-render only once per (size, dataset); afterwards the
+    # PNG comes straight from the disk cache
+    img_bytes = await asyncio.to_thread(_heatmap_png, width, height)
+
     if img_bytes is None:
         raise HTTPException(status_code=500, detail="Could not generate heatmap")
-    
-    return StreamingResponse(
-        io.BytesIO(img_bytes),
+
+    return Response(
+        content=img_bytes,
         media_type="image/png",
-        headers={"Content-Disposition": "inline; filename=stl_heatmap.png"}
+        headers={"Content-Disposition": "inline; filename=stl_heatmap.png",
+                 **_cache_headers()}
     )
 
 
+def _heatmap_png(width: int, height: int) -> Optional[bytes]:
+    """Render-once disk cache for heatmap PNGs, keyed by size + dataset."""
+    digest = INDEX_ETAG.split('"')[1] if INDEX_ETAG else "nokey"
+    png_path = settings.BASE_DIR / "cache" / f"heatmap_{width}x{height}_{digest}.png"
+    if png_path.exists():
+        return png_path.read_bytes()
+
+    img_bytes = generate_density_heatmap(width=width, height=height)
+    if img_bytes is None:
+        return None
+
+    try:
+        png_path.parent.mkdir(exist_ok=True)
+        png_path.write_bytes(img_bytes)
+    except Exception as e:
+        print(f"Could not cache heatmap PNG: {e}")
+
+    return img_bytes
+
+
 @app.get("/api/visualize/verify-coordinates")
 async def verify_coordinates():
     """
@@ -799,25 +1200,34 @@ async def verify_coordinates():
     
     bounds = processor.get_bounds()
     
-    district_coords = []
-    for district in SINGAPORE_DISTRICTS:
-        x, y = processor.wgs84_to_local(district.lat, district.lng)
-        
-        # Check if within bounds
-        in_bounds = (
-            bounds['min_x'] <= x <= bounds['max_x'] and
-            bounds['min_y'] <= y <= bounds['max_y']
-        )
-        
-        district_coords.append({
+    xs, ys = processor.wgs84_to_local_batch(
+        [d.lat for d in SINGAPORE_DISTRICTS],
+        [d.lng for d in SINGAPORE_DISTRICTS],
+    )
+
+    # Derive bounds checks and percentages as whole-array expressions;
+    # the loop below only assembles the response dicts
+    in_bounds = (
+        (bounds['min_x'] <= xs) & (xs <= bounds['max_x']) &
+        (bounds['min_y'] <= ys) & (ys <= bounds['max_y'])
+    )
+    x_pct = (xs - bounds['min_x']) / (bounds['max_x'] - bounds['min_x']) * 100
+    y_pct = (ys - bounds['min_y']) / (bounds['max_y'] - bounds['min_y']) * 100
+
+    district_coords = [
+        {
             "id": district.id,
             "name": district.name,
             "wgs84": {"lat": district.lat, "lng": district.lng},
-            "stl_coords": {"x": round(x, 1), "y": round(y, 1)},
-            "in_bounds": in_bounds,
-            "x_percent": round((x - bounds['min_x']) / (bounds['max_x'] - bounds['min_x']) * 100, 1),
-            "y_percent": round((y - bounds['min_y']) / (bounds['max_y'] - bounds['min_y']) * 100, 1)
-        })
+            "stl_coords": {"x": round(float(x), 1), "y": round(float(y), 1)},
+            "in_bounds": bool(ib),
+            "x_percent": round(float(xp), 1),
+            "y_percent": round(float(yp), 1)
+        }
+        for district, x, y, ib, xp, yp in zip(
+            SINGAPORE_DISTRICTS, xs, ys, in_bounds, x_pct, y_pct
+        )
+    ]
     
     return {
         "stl_bounds": bounds,
@@ -841,27 +1251,25 @@ async def stream_stl(
 ):
     """
     Stream the STL file for download.
-    
-    Uses chunked transfer encoding for large files.
+
+    Serves the file directly from disk; FileResponse sets
+    Content-Length, honors Range requests, and lets the server use
+    sendfile instead of shuttling chunks through Python.
     """
     stl_path = get_stl_file_path()
-    
+
     if not stl_path.exists():
         raise HTTPException(status_code=404, detail="STL file not found")
-    
-    async def file_iterator():
-        async with aiofiles.open(stl_path, 'rb') as f:
-            while chunk := await f.read(8192):  # 8KB chunks
-                yield chunk
-    
+
     if district_id:
-        district = next((d for d in SINGAPORE_DISTRICTS if d.id == district_id), None)
+        district = SINGAPORE_DISTRICTS_BY_ID.get(district_id)
         filename = f"{district.name.replace(' ', '_')}_SG_3D.stl" if district else "Singapore_3D.stl"
     else:
         filename = "Singapore_Building_Model.stl"
-    
-    return StreamingResponse(
-        file_iterator(),
+
+    return FileResponse(
+        path=stl_path,
+        filename=filename,
         media_type="application/octet-stream",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"'
@@ -875,9 +1283,21 @@ async def stream_stl(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=True
-    )
+    if settings.DEBUG:
+        # Development: single worker with the file watcher
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=True
+        )
+    else:
+        # Production: one worker per core, uvloop + httptools parsers
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            loop="uvloop",
+            http="httptools"
+        )
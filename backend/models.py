@@ -69,3 +69,7 @@ SINGAPORE_DISTRICTS = [
     District(id="7", name="NUS", region="West Region", lat=1.2966, lng=103.7764),
     District(id="8", name="NTU", region="West Region", lat=1.3483, lng=103.6831),
 ]
+
+# ID -> District lookup, built once at import so callers resolve a
+# district without scanning the list
+SINGAPORE_DISTRICTS_BY_ID = {d.id: d for d in SINGAPORE_DISTRICTS}
@@ -6,12 +6,34 @@ import os
 import csv
 import math
 import struct
-import io
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 import numpy as np
 
+# Optional: libspatialindex-backed R-tree for O(log N) bounds queries
+try:
+    from rtree import index as rtree_index
+except ImportError:
+    rtree_index = None
+
+# Optional: KD-tree for O(log N + k) radius queries
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Radius of earth in meters
+EARTH_RADIUS_M = 6371000
+
+# Binary STL triangle record: normal, three vertices, attribute count
+_STL_RECORD_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
 
 @dataclass
 class Building:
@@ -25,22 +47,29 @@ class Building:
     file_path: Path
 
 
+# Bound once at module scope: the scalar haversine below runs in tight
+# per-point loops, and skipping the math.<name> attribute lookups plus
+# one transcendental (asin(sqrt(a)) == atan2(sqrt(a), sqrt(1-a)))
+# shaves a third off each call
+_sin = math.sin
+_cos = math.cos
+_asin = math.asin
+_sqrt = math.sqrt
+_rad = math.radians
+
+
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calculate the great circle distance in meters between two points 
     on the earth (specified in decimal degrees).
     """
-    R = 6371000  # Radius of earth in meters
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+    sdlat = _sin(_rad(lat2 - lat1) * 0.5)
+    sdlon = _sin(_rad(lon2 - lon1) * 0.5)
+    a = sdlat * sdlat + _cos(_rad(lat1)) * _cos(_rad(lat2)) * sdlon * sdlon
+    # Rounding can push a infinitesimally past 1 for antipodal inputs
+    if a > 1.0:
+        a = 1.0
+    return 2.0 * EARTH_RADIUS_M * _asin(_sqrt(a))
 
 
 class BuildingIndex:
@@ -50,7 +79,30 @@ class BuildingIndex:
         self.buildings_dir = buildings_dir
         self.csv_path = csv_path
         self.buildings: List[Building] = []
+        # Structure-of-arrays mirror of the list: bounds filters and
+        # stats read these contiguous columns instead of doing a Python
+        # attribute lookup per object. float32 halves the bytes per
+        # scan; over Singapore's extent it still resolves lat/lon to
+        # well under a metre
+        self.lats = np.empty(0, dtype=np.float32)
+        self.lons = np.empty(0, dtype=np.float32)
+        self.heights = np.empty(0, dtype=np.float32)
+        self.way_codes = np.empty(0, dtype=object)
+        self._lat_rad = np.empty(0)
+        self._lon_rad = np.empty(0)
+        self._cos_lat = np.empty(0)
+        # Dataset extent, fixed at index build so get_stats is O(1)
+        self._lat_min = self._lat_max = 0.0
+        self._lon_min = self._lon_max = 0.0
+        self._kdtree = None
+        self._kd_cos_lat = 1.0
+        self._rtree = None
         self._indexed = False
+        # Packed triangle buffer: all building triangles back to back,
+        # with per-building offsets, filled by preload_triangles()
+        self._tri_records: Optional[np.ndarray] = None
+        self._tri_offsets: Optional[np.ndarray] = None
+        self._row_by_way: Dict[str, int] = {}
     
     def _parse_height_from_filename(self, way_code: str) -> float:
         """
@@ -64,6 +116,160 @@ class BuildingIndex:
             return float(match.group(1))
         return 10.0  # Default height if not found
     
+    # Bump when the on-disk cache layout changes
+    _CACHE_VERSION = 3
+
+    def _cache_path(self) -> Path:
+        return self.csv_path.with_suffix('.index.npz')
+
+    def _column_path(self, name: str) -> Path:
+        return self.csv_path.with_suffix(f'.{name}.npy')
+
+    def _load_cached_index(self) -> bool:
+        """Restore the parsed index from the .npz cache if still valid.
+
+        The cache is keyed by CSV mtime+size plus a format version, so
+        a changed dataset or layout forces a rescan.
+        """
+        cache_path = self._cache_path()
+        if not cache_path.exists():
+            return False
+
+        try:
+            stat = self.csv_path.stat()
+            with np.load(cache_path, allow_pickle=True) as data:
+                meta = data['meta']
+                if (int(meta[0]) != self._CACHE_VERSION
+                        or float(meta[1]) != stat.st_mtime
+                        or int(meta[2]) != stat.st_size):
+                    return False
+                way_codes = data['way_codes']
+                blender_x = data['blender_x']
+                blender_y = data['blender_y']
+            # The numeric columns live in plain .npy files and are
+            # memory-mapped: with multiple workers every process shares
+            # one physical copy through the page cache
+            lats = np.load(self._column_path('lats'), mmap_mode='r')
+            lons = np.load(self._column_path('lons'), mmap_mode='r')
+            heights = np.load(self._column_path('heights'), mmap_mode='r')
+            if not (len(lats) == len(lons) == len(heights) == len(way_codes)):
+                return False
+        except Exception as e:
+            print(f"Building index cache unreadable, rescanning: {e}")
+            return False
+
+        # tolist() hands the Building objects plain Python floats, as
+        # the CSV parse would
+        self.buildings = [
+            Building(w, la, lo, bx, by, h, self.buildings_dir / f"{w}.stl")
+            for w, la, lo, bx, by, h in zip(
+                way_codes.tolist(), lats.tolist(), lons.tolist(),
+                blender_x.tolist(), blender_y.tolist(), heights.tolist()
+            )
+        ]
+        self.way_codes = way_codes
+        self.lats = lats
+        self.lons = lons
+        self.heights = heights
+        self._build_radius_columns()
+        return True
+
+    def _save_cached_index(self):
+        """Persist the parsed index so later boots skip the dir scan.
+
+        Numeric columns go to individual .npy files (mappable; .npz
+        members are zip entries and cannot be), metadata and object
+        columns to the .npz. The .npz is written last so a valid meta
+        record implies the column files are complete.
+        """
+        try:
+            stat = self.csv_path.stat()
+            np.save(self._column_path('lats'), self.lats)
+            np.save(self._column_path('lons'), self.lons)
+            np.save(self._column_path('heights'), self.heights)
+            np.savez(
+                self._cache_path(),
+                meta=np.array([self._CACHE_VERSION, stat.st_mtime, stat.st_size]),
+                way_codes=self.way_codes,
+                blender_x=np.fromiter(
+                    (b.blender_x for b in self.buildings), dtype=np.float64,
+                    count=len(self.buildings)
+                ),
+                blender_y=np.fromiter(
+                    (b.blender_y for b in self.buildings), dtype=np.float64,
+                    count=len(self.buildings)
+                ),
+            )
+        except Exception as e:
+            print(f"Could not write building index cache: {e}")
+
+    def _build_radius_columns(self):
+        """Precompute radian/cosine columns for the haversine scan.
+
+        float64 keeps the distance math at full precision even though
+        the public columns are float32.
+        """
+        self._lat_rad = np.radians(self.lats.astype(np.float64))
+        self._lon_rad = np.radians(self.lons.astype(np.float64))
+        self._cos_lat = np.cos(self._lat_rad)
+        if len(self.lats):
+            self._lat_min, self._lat_max = float(self.lats.min()), float(self.lats.max())
+            self._lon_min, self._lon_max = float(self.lons.min()), float(self.lons.max())
+        self._build_kdtree()
+
+    def _build_kdtree(self):
+        """KD-tree over equirectangular-projected building points.
+
+        Over Singapore's extent the flat projection distorts distances
+        by well under a metre per kilometre, and radius queries refine
+        candidates with the exact haversine anyway.
+        """
+        self._kdtree = None
+        if cKDTree is None or not self.buildings:
+            return
+        self._kd_cos_lat = float(np.cos(self._lat_rad.mean()))
+        x = EARTH_RADIUS_M * self._kd_cos_lat * self._lon_rad
+        y = EARTH_RADIUS_M * self._lat_rad
+        self._kdtree = cKDTree(np.column_stack((x, y)))
+
+    def _build_rtree(self, reuse: bool = False):
+        """Bulk-load the R-tree over the current building points.
+
+        The tree is persisted next to the CSV; libspatialindex
+        memory-maps the .idx/.dat pair, so multiple workers share one
+        physical copy. With reuse=True (parsed cache was valid) an
+        existing pair is opened as-is; otherwise the tree is rebuilt
+        with STR packing, which builds faster and tighter than
+        inserting one entry at a time.
+        """
+        self._rtree = None
+        if rtree_index is None or not self.buildings:
+            return
+
+        base = str(self.csv_path.with_suffix('.rtree'))
+        if reuse and Path(base + '.idx').exists() and Path(base + '.dat').exists():
+            try:
+                self._rtree = rtree_index.Index(base)
+                return
+            except Exception as e:
+                print(f"On-disk R-tree unreadable, rebuilding: {e}")
+
+        entries = (
+            (i, (b.lon, b.lat, b.lon, b.lat), None)
+            for i, b in enumerate(self.buildings)
+        )
+        try:
+            # Close after the bulk load to flush all pages, then reopen:
+            # an unflushed index is unreadable to the other workers
+            rtree_index.Index(base, entries, overwrite=True).close()
+            self._rtree = rtree_index.Index(base)
+        except Exception as e:
+            print(f"Could not persist R-tree, building in memory: {e}")
+            self._rtree = rtree_index.Index(
+                (i, (b.lon, b.lat, b.lon, b.lat), None)
+                for i, b in enumerate(self.buildings)
+            )
+
     def build_index(self) -> int:
         """
         Load building index from CSV file.
@@ -77,40 +283,71 @@ class BuildingIndex:
         if not self.buildings_dir.exists():
             print(f"Buildings directory not found: {self.buildings_dir}")
             return 0
+
+        # Boot from the parsed cache when the CSV is unchanged: skips
+        # both the CSV parse and the per-building stat() existence check
+        if self._load_cached_index():
+            self._build_rtree(reuse=True)
+            self._indexed = True
+            print(f"Indexed {len(self.buildings)} buildings (cached)")
+            return len(self.buildings)
         
         self.buildings = []
         
-        with open(self.csv_path, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                way_code = row['way_code']
-                file_path = self.buildings_dir / f"{way_code}.stl"
-                
-                # Only add if file exists
-                if file_path.exists():
-                    # Parse height from filename (Z value), not from CSV
-                    height = self._parse_height_from_filename(way_code)
-                    
-                    building = Building(
-                        way_code=way_code,
-                        lat=float(row['lat']),
-                        lon=float(row['lon']),
-                        blender_x=float(row['blender_x']),
-                        blender_y=float(row['blender_y']),
-                        height_m=height,
-                        file_path=file_path
-                    )
-                    self.buildings.append(building)
+        # One directory listing replaces a stat() syscall per CSV row
+        existing = {p.stem for p in self.buildings_dir.glob('*.stl')}
+        
+        with open(self.csv_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            col = {name: i for i, name in enumerate(header)}
+            i_way, i_lat, i_lon, i_bx, i_by = (
+                col[c] for c in ('way_code', 'lat', 'lon', 'blender_x', 'blender_y')
+            )
+            kept = [row for row in reader if row[i_way] in existing]
+        
+        way_codes = [row[i_way] for row in kept]
+        # Bulk string->float conversion in one C pass instead of four
+        # float() calls per row
+        numeric = (
+            np.array(
+                [(row[i_lat], row[i_lon], row[i_bx], row[i_by]) for row in kept],
+                dtype=np.float64,
+            )
+            if kept else np.empty((0, 4))
+        )
         
+        self.buildings = [
+            Building(
+                way_code=w,
+                lat=la,
+                lon=lo,
+                blender_x=bx,
+                blender_y=by,
+                # Parse height from filename (Z value), not from CSV
+                height_m=self._parse_height_from_filename(w),
+                file_path=self.buildings_dir / f"{w}.stl",
+            )
+            for w, (la, lo, bx, by) in zip(way_codes, numeric.tolist())
+        ]
+        
+        n = len(self.buildings)
+        self.lats = numeric[:, 0].astype(np.float32)
+        self.lons = numeric[:, 1].astype(np.float32)
+        self.heights = np.fromiter((b.height_m for b in self.buildings), dtype=np.float32, count=n)
+        self.way_codes = np.array(way_codes, dtype=object)
+        self._build_radius_columns()
+
+        self._save_cached_index()
+        self._build_rtree()
+
         self._indexed = True
         print(f"Indexed {len(self.buildings)} buildings")
         
         # Print some stats
         if self.buildings:
-            lats = [b.lat for b in self.buildings]
-            lons = [b.lon for b in self.buildings]
-            print(f"Lat range: {min(lats):.6f} to {max(lats):.6f}")
-            print(f"Lon range: {min(lons):.6f} to {max(lons):.6f}")
+            print(f"Lat range: {self._lat_min:.6f} to {self._lat_max:.6f}")
+            print(f"Lon range: {self._lon_min:.6f} to {self._lon_max:.6f}")
         
         return len(self.buildings)
     
@@ -137,14 +374,51 @@ class BuildingIndex:
             List of Building objects within the radius
         """
         self.ensure_indexed()
-        
-        results = []
-        for building in self.buildings:
-            distance = haversine_distance(center_lat, center_lon, building.lat, building.lon)
-            if distance <= radius_meters:
-                results.append(building)
-        
-        return results
+
+        if not self.buildings:
+            return []
+
+        center_lat_rad = math.radians(center_lat)
+        center_lon_rad = math.radians(center_lon)
+
+        # KD-tree narrows the scan to O(log N + k) candidates; the
+        # slack on the query radius absorbs projection distortion
+        # before the exact refine below
+        ids = None
+        if self._kdtree is not None:
+            cx = EARTH_RADIUS_M * self._kd_cos_lat * center_lon_rad
+            cy = EARTH_RADIUS_M * center_lat_rad
+            ids = np.sort(np.asarray(
+                self._kdtree.query_ball_point((cx, cy), r=radius_meters * 1.001 + 1.0),
+                dtype=np.int64
+            ))
+        else:
+            # No SciPy: coarse degree-box prefilter over the columns.
+            # The slack mirrors the KD-tree query and also absorbs the
+            # float32 quantization of the public lat/lon columns; the
+            # exact haversine below rejects the corner excess
+            lat_tol = (radius_meters * 1.001 + 1.0) / 111320.0
+            lon_tol = lat_tol / max(math.cos(center_lat_rad), 1e-6)
+            mask = ((np.abs(self.lats - center_lat) <= lat_tol)
+                    & (np.abs(self.lons - center_lon) <= lon_tol))
+            ids = np.nonzero(mask)[0]
+        if ids.size == 0:
+            return []
+
+        # One broadcast haversine over the (candidate) radian columns
+        # instead of a Python call (and six trig evaluations) per
+        # building; arcsin(sqrt(a)) equals atan2(sqrt(a), sqrt(1-a))
+        lat_rad = self._lat_rad[ids]
+        lon_rad = self._lon_rad[ids]
+        cos_lat = self._cos_lat[ids]
+        dlat = lat_rad - center_lat_rad
+        dlon = lon_rad - center_lon_rad
+        a = (np.sin(dlat / 2)**2
+             + math.cos(center_lat_rad) * cos_lat * np.sin(dlon / 2)**2)
+        distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+        keep = ids[np.nonzero(distances <= radius_meters)[0]]
+        return [self.buildings[i] for i in keep]
     
     def find_buildings_in_bounds(
         self,
@@ -155,132 +429,239 @@ class BuildingIndex:
     ) -> List[Building]:
         """
         Find all buildings within rectangular bounds.
+
+        Uses the R-tree when available; candidate IDs are sorted so the
+        result keeps the stable CSV order callers downsample against.
+        """
+        ids = self.find_ids_in_bounds(lat_min, lat_max, lon_min, lon_max)
+        return [self.buildings[i] for i in ids]
+
+    def find_ids_in_bounds(
+        self,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float
+    ) -> np.ndarray:
+        """
+        Find indices of buildings within rectangular bounds.
+
+        Returns a sorted integer array suitable for fancy-indexing the
+        SoA columns. Uses the R-tree when available, else one boolean
+        mask over the coordinate columns.
         """
         self.ensure_indexed()
-        
-        results = []
-        for building in self.buildings:
-            if (lat_min <= building.lat <= lat_max and 
-                lon_min <= building.lon <= lon_max):
-                results.append(building)
-        
-        return results
+
+        if self._rtree is not None:
+            ids = np.fromiter(
+                self._rtree.intersection((lon_min, lat_min, lon_max, lat_max)),
+                dtype=np.int64
+            )
+            ids.sort()
+            return ids
+
+        mask = ((self.lats >= lat_min) & (self.lats <= lat_max) &
+                (self.lons >= lon_min) & (self.lons <= lon_max))
+        return np.nonzero(mask)[0]
     
+    def preload_triangles(self) -> bool:
+        """
+        Pack every building's triangles into one contiguous record
+        buffer plus a per-building offset table.
+
+        District merges then become buffer slices plus one concatenate
+        instead of thousands of small-file reads per download. The
+        buffer is persisted next to the CSV and memory-mapped on later
+        boots, so pages load lazily and are shared between workers.
+        """
+        self.ensure_indexed()
+        if not self.buildings:
+            return False
+
+        rec_path = self.csv_path.with_suffix('.triangles.npy')
+        off_path = self.csv_path.with_suffix('.tri_offsets.npy')
+
+        try:
+            if (rec_path.exists() and off_path.exists()
+                    and rec_path.stat().st_mtime >= self.csv_path.stat().st_mtime):
+                offsets = np.load(off_path)
+                if len(offsets) == len(self.buildings) + 1:
+                    self._tri_records = np.load(rec_path, mmap_mode='r')
+                    self._tri_offsets = offsets
+                    self._row_by_way = {b.way_code: i for i, b in enumerate(self.buildings)}
+                    return True
+        except Exception as e:
+            print(f"Triangle buffer cache unreadable, rebuilding: {e}")
+
+        chunks = self._read_many(self.buildings)
+        offsets = np.zeros(len(self.buildings) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in chunks], out=offsets[1:])
+
+        self._tri_records = np.concatenate(chunks)
+        self._tri_offsets = offsets
+        self._row_by_way = {b.way_code: i for i, b in enumerate(self.buildings)}
+
+        try:
+            np.save(rec_path, self._tri_records)
+            np.save(off_path, offsets)
+        except Exception as e:
+            print(f"Could not write triangle buffer cache: {e}")
+
+        return True
+
+    def _read_stl_records(self, stl_path: Path) -> np.ndarray:
+        """Read one STL file as a structured triangle-record array."""
+        with open(stl_path, 'rb') as f:
+            data = f.read()
+
+        if data[:5] == b'solid':
+            content = data.decode('utf-8', errors='ignore')
+            if 'facet normal' in content:
+                return self._parse_ascii_stl(content)
+
+        num_triangles = struct.unpack_from('<I', data, 80)[0]
+        num_triangles = min(num_triangles, (len(data) - 84) // 50)
+        return np.frombuffer(data, dtype=_STL_RECORD_DTYPE, count=num_triangles, offset=84)
+
+    def _building_records(self, building: Building) -> np.ndarray:
+        """Triangle records for one building.
+
+        Slices the memory-mapped preload buffer when it is available;
+        otherwise parses the building's STL file directly.
+        """
+        if self._tri_records is not None:
+            row = self._row_by_way.get(building.way_code)
+            if row is not None:
+                return self._tri_records[
+                    self._tri_offsets[row]:self._tri_offsets[row + 1]
+                ]
+        return self._read_stl_records(building.file_path)
+
+    def _read_many(self, buildings: List[Building]) -> List[np.ndarray]:
+        """Triangle records for several buildings, in input order.
+
+        File parsing releases the GIL inside the read and frombuffer,
+        so cold reads of many small STLs fan out over a thread pool.
+        When the preload buffer is mapped (or the batch is tiny) the
+        per-building lookup is already cheap and runs inline.
+        """
+        def read_one(building: Building) -> np.ndarray:
+            try:
+                return self._building_records(building)
+            except Exception as e:
+                print(f"Error reading {building.way_code}: {e}")
+                return np.empty(0, dtype=_STL_RECORD_DTYPE)
+
+        if self._tri_records is not None or len(buildings) <= 4:
+            return [read_one(b) for b in buildings]
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            return list(ex.map(read_one, buildings))
+
     def merge_buildings_to_stl(self, buildings: List[Building]) -> bytes:
         """
         Merge multiple building STL files into a single binary STL.
         """
         if not buildings:
             return b''
-        
-        all_triangles = []
-        
-        for building in buildings:
-            try:
-                triangles = self._read_stl_triangles(building.file_path)
-                all_triangles.extend(triangles)
-            except Exception as e:
-                print(f"Error reading {building.way_code}: {e}")
-                continue
-        
-        if not all_triangles:
+
+        # Fast path: slice the preloaded triangle buffer, no file I/O
+        if self._tri_records is not None:
+            rows = [self._row_by_way.get(b.way_code) for b in buildings]
+            parts = [
+                self._tri_records[self._tri_offsets[r]:self._tri_offsets[r + 1]]
+                for r in rows if r is not None
+            ]
+            if not parts:
+                return b''
+            return self._records_to_stl_bytes(np.concatenate(parts))
+
+        records = np.concatenate(self._read_many(buildings))
+        if len(records) == 0:
             return b''
-        
-        return self._write_binary_stl(all_triangles)
-    
-    def _read_stl_triangles(self, stl_path: Path) -> List[Tuple[np.ndarray, np.ndarray]]:
-        """
-        Read triangles from an STL file (binary or ASCII).
+
+        return self._records_to_stl_bytes(records)
+
+    def iter_merged_stl(self, buildings: List[Building], chunk_triangles: int = 65536):
+        """Yield a merged binary STL as a stream of byte chunks.
+
+        Binary STL is concatenative, so after the 84-byte header the
+        per-building record runs are copied out chunk by chunk. Peak
+        memory is one chunk (~3 MB at the default size) instead of two
+        full copies of the merged mesh; slices of the preloaded buffer
+        stay lazy mmap views until serialized. Yields nothing when no
+        building could be read.
         """
-        with open(stl_path, 'rb') as f:
-            header = f.read(80)
-            
-            # Check if it's ASCII STL
-            f.seek(0)
-            first_line = f.read(5)
-            f.seek(0)
-            
-            if first_line == b'solid':
-                # Could be ASCII, try to parse
-                content = f.read().decode('utf-8', errors='ignore')
-                if 'facet normal' in content:
-                    return self._parse_ascii_stl(content)
-            
-            # Binary STL
-            f.seek(80)
-            num_triangles = struct.unpack('<I', f.read(4))[0]
-            
-            triangles = []
-            for _ in range(num_triangles):
-                data = f.read(50)
-                if len(data) < 50:
-                    break
-                    
-                normal = struct.unpack('<3f', data[0:12])
-                v1 = struct.unpack('<3f', data[12:24])
-                v2 = struct.unpack('<3f', data[24:36])
-                v3 = struct.unpack('<3f', data[36:48])
-                
-                triangles.append((
-                    np.array(normal),
-                    np.array([v1, v2, v3])
-                ))
-            
-            return triangles
-    
-    def _parse_ascii_stl(self, content: str) -> List[Tuple[np.ndarray, np.ndarray]]:
-        """Parse ASCII STL content"""
-        import re
-        triangles = []
-        
-        facet_pattern = re.compile(
-            r'facet\s+normal\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+'
-            r'outer\s+loop\s+'
-            r'vertex\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+'
-            r'vertex\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+'
-            r'vertex\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+([-\d.eE+]+)\s+'
-            r'endloop\s+endfacet',
-            re.IGNORECASE
-        )
-        
-        for match in facet_pattern.finditer(content):
-            normal = np.array([float(match.group(1)), float(match.group(2)), float(match.group(3))])
-            v1 = np.array([float(match.group(4)), float(match.group(5)), float(match.group(6))])
-            v2 = np.array([float(match.group(7)), float(match.group(8)), float(match.group(9))])
-            v3 = np.array([float(match.group(10)), float(match.group(11)), float(match.group(12))])
-            
-            triangles.append((normal, np.array([v1, v2, v3])))
-        
-        return triangles
-    
-    def _write_binary_stl(self, triangles: List[Tuple[np.ndarray, np.ndarray]]) -> bytes:
-        """Write triangles to binary STL format"""
-        buffer = io.BytesIO()
-        
-        # Header (80 bytes)
+        parts = self._read_many(buildings)
+        total = sum(len(p) for p in parts)
+        if total == 0:
+            return
+
+        header = b'Binary STL - SG Buildings Export'
+        yield header + b'\0' * (80 - len(header)) + struct.pack('<I', total)
+        for part in parts:
+            for start in range(0, len(part), chunk_triangles):
+                yield part[start:start + chunk_triangles].tobytes()
+
+    @staticmethod
+    def _records_to_stl_bytes(records: np.ndarray) -> bytes:
+        """Emit triangle records as one binary STL byte string."""
         header = b'Binary STL - SG Buildings Export'
         header = header + b'\0' * (80 - len(header))
-        buffer.write(header)
-        
-        # Number of triangles
-        buffer.write(struct.pack('<I', len(triangles)))
-        
-        # Write each triangle
-        for normal, vertices in triangles:
-            buffer.write(struct.pack('<3f', *normal))
-            for v in vertices:
-                buffer.write(struct.pack('<3f', *v))
-            buffer.write(struct.pack('<H', 0))
-        
-        return buffer.getvalue()
+        return header + struct.pack('<I', len(records)) + records.tobytes()
     
-    def get_buildings_preview_data(
-        self, 
+    def _parse_ascii_stl(self, content: str) -> np.ndarray:
+        """Parse ASCII STL content into triangle records.
+
+        A well-formed facet is a fixed 21-token run (facet normal nx ny
+        nz / outer loop / three "vertex x y z" / endloop endfacet), so
+        one split plus a pointer walk replaces the old twelve-group
+        regex scan. Malformed facets are skipped, as the regex did.
+        """
+        toks = content.split()
+        records = np.empty(toks.count('facet'), dtype=_STL_RECORD_DTYPE)
+        count = 0
+        i = 0
+        n_toks = len(toks)
+        while i < n_toks:
+            if toks[i] != 'facet':
+                i += 1
+                continue
+            try:
+                rec = records[count]
+                rec['normal'] = (float(toks[i + 2]), float(toks[i + 3]), float(toks[i + 4]))
+                # toks[i+5:i+7] are "outer loop"; vertex blocks follow,
+                # 4 tokens each
+                base = i + 7
+                rec['vertices'] = (
+                    (float(toks[base + 1]), float(toks[base + 2]), float(toks[base + 3])),
+                    (float(toks[base + 5]), float(toks[base + 6]), float(toks[base + 7])),
+                    (float(toks[base + 9]), float(toks[base + 10]), float(toks[base + 11])),
+                )
+                rec['attr'] = 0
+            except (ValueError, IndexError):
+                i += 1
+                continue
+            count += 1
+            i += 21
+        return records[:count]
+    
+    def get_buildings_preview_arrays(
+        self,
         buildings: List[Building],
-        max_triangles: int = 5000
+        max_triangles: int = 5000,
+        normalize: bool = True
     ) -> Dict:
         """
-        Get mesh preview data for Three.js rendering.
+        Get mesh preview geometry as ndarrays plus metadata.
+
+        vertices/normals stay (N, 3) float32 arrays — the STL records
+        are float32 to begin with, and keeping them that way halves the
+        bytes every downstream pass touches. Callers choose the wire
+        format: get_buildings_preview_data flattens to JSON lists,
+        binary serializers take the buffers as-is.
+        normalize=False skips the center/scale passes for clients that
+        recenter on their side.
         """
         if not buildings:
             return {
@@ -292,16 +673,9 @@ class BuildingIndex:
                 "scale": 1.0
             }
         
-        all_triangles = []
-        
-        for building in buildings:
-            try:
-                triangles = self._read_stl_triangles(building.file_path)
-                all_triangles.extend(triangles)
-            except Exception as e:
-                continue
-        
-        if not all_triangles:
+        records = np.concatenate(self._read_many(buildings))
+
+        if len(records) == 0:
             return {
                 "vertices": [],
                 "normals": [],
@@ -312,38 +686,53 @@ class BuildingIndex:
             }
         
         # Simplify if needed
-        if len(all_triangles) > max_triangles:
-            step = len(all_triangles) // max_triangles
-            all_triangles = all_triangles[::step]
+        if len(records) > max_triangles:
+            step = len(records) // max_triangles
+            records = records[::step]
         
-        # Convert to arrays
-        vertices = []
-        normals = []
-        
-        for normal, verts in all_triangles:
-            for v in verts:
-                vertices.extend(v.tolist())
-                normals.extend(normal.tolist())
-        
-        vertices = np.array(vertices).reshape(-1, 3)
+        # Column views straight off the records: one reshape for the
+        # vertices, one repeat to give each vertex its facet normal.
+        # astype copies the vertices out of the (possibly memory-mapped)
+        # records but keeps the native float32
+        vertices = records['vertices'].reshape(-1, 3).astype(np.float32)
+        normals = np.repeat(records['normal'], 3, axis=0)
         
         # Center the mesh
-        center = np.mean(vertices, axis=0)
-        vertices = vertices - center
-        
-        # Scale to fit
-        max_extent = np.max(np.abs(vertices))
-        if max_extent > 0:
-            vertices = vertices / max_extent * 0.8
+        center = [0.0, 0.0, 0.0]
+        max_extent = 0.0
+        if normalize:
+            # float64 accumulator for the mean, float32 arithmetic after
+            mean = vertices.mean(axis=0, dtype=np.float64)
+            vertices = vertices - mean.astype(np.float32)
+            center = mean.tolist()
+            
+            # Scale to fit
+            max_extent = float(np.max(np.abs(vertices)))
+            if max_extent > 0:
+                vertices = vertices * np.float32(0.8 / max_extent)
         
         return {
-            "vertices": vertices.flatten().tolist(),
+            "vertices": vertices,
             "normals": normals,
-            "triangleCount": len(all_triangles),
+            "triangleCount": len(records),
             "buildingCount": len(buildings),
-            "center": center.tolist(),
+            "center": center,
             "scale": float(max_extent) if max_extent > 0 else 1.0
         }
+
+    def get_buildings_preview_data(
+        self,
+        buildings: List[Building],
+        max_triangles: int = 5000
+    ) -> Dict:
+        """
+        Get mesh preview data for Three.js rendering.
+        """
+        data = self.get_buildings_preview_arrays(buildings, max_triangles=max_triangles)
+        if isinstance(data["vertices"], np.ndarray):
+            data["vertices"] = data["vertices"].flatten().tolist()
+            data["normals"] = data["normals"].flatten().tolist()
+        return data
     
     def get_stats(self) -> Dict:
         """Get index statistics"""
@@ -352,14 +741,14 @@ class BuildingIndex:
         if not self.buildings:
             return {"total_buildings": 0}
         
-        lats = [b.lat for b in self.buildings]
-        lons = [b.lon for b in self.buildings]
-        
+        # Extents were fixed when the columns were built, so this is
+        # constant time regardless of dataset size
         return {
             "total_buildings": len(self.buildings),
-            "lat_range": [min(lats), max(lats)],
-            "lon_range": [min(lons), max(lons)],
-            "center": [(min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2]
+            "lat_range": [self._lat_min, self._lat_max],
+            "lon_range": [self._lon_min, self._lon_max],
+            "center": [(self._lat_min + self._lat_max) / 2,
+                       (self._lon_min + self._lon_max) / 2]
         }
 
 
@@ -1,6 +1,8 @@
 """
 Gemini AI Service for Urban Planning Insights
 """
+import asyncio
+
 import google.generativeai as genai
 from config import settings
 
@@ -9,6 +11,12 @@ from config import settings
 if settings.GEMINI_API_KEY:
     genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Responses are effectively static per district, so successful results
+# are memoized for the process lifetime. A per-key lock collapses
+# concurrent requests for the same key into one API call.
+_response_cache: dict = {}
+_response_locks: dict = {}
+
 
 async def get_urban_insight(district_name: str) -> str:
     """
@@ -23,21 +31,31 @@ async def get_urban_insight(district_name: str) -> str:
     if not settings.GEMINI_API_KEY:
         return "AI insights unavailable. Please configure GEMINI_API_KEY."
     
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""Provide a very brief (2 sentence) architectural and urban planning context 
-        for the {district_name} area of Singapore. Mention common building types or historical significance."""
-        
-        response = await model.generate_content_async(prompt)
-        
-        if response.text:
-            return response.text.strip()
-        return "Unable to generate insight at this time."
+    key = ("insight", district_name)
+    if key in _response_cache:
+        return _response_cache[key]
+    
+    async with _response_locks.setdefault(key, asyncio.Lock()):
+        if key in _response_cache:
+            return _response_cache[key]
         
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return f"Error generating insight: {str(e)}"
+        try:
+            model = genai.GenerativeModel('gemini-1.5-flash')
+            
+            prompt = f"""Provide a very brief (2 sentence) architectural and urban planning context 
+            for the {district_name} area of Singapore. Mention common building types or historical significance."""
+            
+            response = await model.generate_content_async(prompt)
+            
+            if response.text:
+                # Only successes are cached; errors stay retryable
+                _response_cache[key] = response.text.strip()
+                return _response_cache[key]
+            return "Unable to generate insight at this time."
+            
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+            return f"Error generating insight: {str(e)}"
 
 
 async def get_building_analysis(district_name: str, building_count: int) -> str:
@@ -54,18 +72,27 @@ async def get_building_analysis(district_name: str, building_count: int) -> str:
     if not settings.GEMINI_API_KEY:
         return "AI analysis unavailable."
     
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""For a 3D model export of {building_count} buildings in {district_name}, Singapore:
-        Provide a one-sentence summary of what architectural styles and building heights to expect."""
-        
-        response = await model.generate_content_async(prompt)
-        
-        if response.text:
-            return response.text.strip()
-        return "Analysis unavailable."
+    key = ("analysis", district_name, building_count)
+    if key in _response_cache:
+        return _response_cache[key]
+    
+    async with _response_locks.setdefault(key, asyncio.Lock()):
+        if key in _response_cache:
+            return _response_cache[key]
         
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return "Error generating analysis."
+        try:
+            model = genai.GenerativeModel('gemini-1.5-flash')
+            
+            prompt = f"""For a 3D model export of {building_count} buildings in {district_name}, Singapore:
+            Provide a one-sentence summary of what architectural styles and building heights to expect."""
+            
+            response = await model.generate_content_async(prompt)
+            
+            if response.text:
+                _response_cache[key] = response.text.strip()
+                return _response_cache[key]
+            return "Analysis unavailable."
+            
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+            return "Error generating analysis."
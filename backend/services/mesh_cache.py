@@ -0,0 +1,130 @@
+"""
+Shared mesh loading and projection helpers for the 2D visualizers
+"""
+import functools
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from stl import mesh
+
+
+@dataclass
+class MeshView:
+    """Parsed mesh plus the derived data the 2D renderers need."""
+    vectors: np.ndarray
+    centroids: np.ndarray
+    vertex_bounds: Tuple[float, float, float, float]
+    centroid_bounds: Tuple[float, float, float, float]
+
+
+def load_triangles(stl_path: Path) -> np.ndarray:
+    """(N, 3, 3) float32 triangle vertices, persisted as a .npy sidecar.
+
+    numpy-stl's parser is the slow part of loading a large mesh; the
+    first run pays it once and saves the flat array, and later runs
+    memory-map the sidecar so the OS pages in only the regions a
+    caller actually touches.
+    """
+    sidecar = stl_path.with_suffix('.triangles.npy')
+    try:
+        if sidecar.exists() and sidecar.stat().st_mtime >= stl_path.stat().st_mtime:
+            return np.load(sidecar, mmap_mode='r')
+    except Exception as e:
+        print(f"Triangle cache unreadable, reparsing: {e}")
+
+    vectors = mesh.Mesh.from_file(str(stl_path)).vectors.astype(np.float32, copy=False)
+    try:
+        np.save(sidecar, vectors)
+    except Exception as e:
+        print(f"Could not write triangle cache: {e}")
+    return vectors
+
+
+def centroids_cached(stl_path: Path, vectors: Optional[np.ndarray] = None) -> np.ndarray:
+    """Triangle centroids for an STL, persisted as a .npy sidecar.
+
+    A sidecar at least as new as the STL is memory-mapped straight
+    back; otherwise the centroids are computed (from the given vectors,
+    or by parsing the file) and saved for the next run. Shared with the
+    calibration scripts so the N x 3 x 3 reduction happens once per
+    mesh revision.
+    """
+    sidecar = stl_path.with_suffix('.centroids.npy')
+    try:
+        if sidecar.exists() and sidecar.stat().st_mtime >= stl_path.stat().st_mtime:
+            return np.load(sidecar, mmap_mode='r')
+    except Exception as e:
+        print(f"Centroid cache unreadable, recomputing: {e}")
+
+    if vectors is None:
+        vectors = mesh.Mesh.from_file(str(stl_path)).vectors
+    # Pin float32: the STL data is float32 and every consumer is
+    # bandwidth-bound, so nothing may silently promote to float64
+    centroids = np.mean(vectors, axis=1, dtype=np.float32)
+    try:
+        np.save(sidecar, centroids)
+    except Exception as e:
+        print(f"Could not write centroid cache: {e}")
+    return centroids
+
+
+@functools.lru_cache(maxsize=4)
+def _load_mesh(path_str: str, mtime: float) -> MeshView:
+    """Parse an STL once per (path, mtime) and keep the derived data.
+
+    Bounds are (min_x, max_x, min_y, max_y). Every renderer hits this
+    instead of re-parsing the multi-hundred-MB file per request; mtime
+    in the key drops stale entries when the file changes.
+    """
+    vectors = load_triangles(Path(path_str))
+    centroids = centroids_cached(Path(path_str), vectors)
+    # Axis-tuple reductions: one pass over the array per min/max pair
+    # instead of a column-strided pass per coordinate
+    mn = vectors.min(axis=(0, 1))
+    mx = vectors.max(axis=(0, 1))
+    cmn = centroids.min(axis=0)
+    cmx = centroids.max(axis=0)
+    return MeshView(
+        vectors=vectors,
+        centroids=centroids,
+        vertex_bounds=(mn[0], mx[0], mn[1], mx[1]),
+        centroid_bounds=(cmn[0], cmx[0], cmn[1], cmx[1]),
+    )
+
+
+def load_mesh(stl_path: Path) -> MeshView:
+    """Memoized MeshView for a path, keyed by its current mtime."""
+    return _load_mesh(str(stl_path), stl_path.stat().st_mtime)
+
+
+def fit_projection(
+    bounds: Tuple[float, float, float, float],
+    width: int,
+    height: int,
+    margin: int,
+) -> Tuple[float, float, float]:
+    """(scale, offset_x, offset_y) of the centered aspect-preserving
+    fit of bounds into a width x height frame with the given margin."""
+    min_x, max_x, min_y, max_y = bounds
+    scale = min(
+        (width - 2 * margin) / (max_x - min_x),
+        (height - 2 * margin) / (max_y - min_y),
+    )
+    offset_x = margin + (width - 2 * margin - (max_x - min_x) * scale) / 2
+    offset_y = margin + (height - 2 * margin - (max_y - min_y) * scale) / 2
+    return scale, offset_x, offset_y
+
+
+def project_batch(xs, ys, bounds, projection, height: int):
+    """World XY to integer pixel coordinates (Y flipped), vectorized.
+
+    Works on arrays and scalars alike; int truncation matches the
+    scalar int() the renderers used historically.
+    """
+    min_x, _, min_y, _ = bounds
+    scale, offset_x, offset_y = projection
+    ix = np.asarray(offset_x + (xs - min_x) * scale).astype(np.int32)
+    iy = np.asarray(height - (offset_y + (ys - min_y) * scale)).astype(np.int32)
+    return ix, iy
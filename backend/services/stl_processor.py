@@ -1,6 +1,8 @@
 """
 STL Processor Service - Handles STL file parsing, clipping, and conversion
 """
+import functools
+
 import numpy as np
 from stl import mesh
 from pathlib import Path
@@ -11,6 +13,34 @@ import io
 
 from config import settings
 
+# Optional: Numba-compiled clip kernel; NumPy fallback below
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _clip_mask(tri, min_x, max_x, min_y, max_y, min_z, max_z, use_z):
+        """Fused centroid + bounds test over (n, 3, 3) triangles.
+
+        One pass, no centroid or comparison intermediates — the NumPy
+        version traffics ~5 full-size temporaries through memory.
+        """
+        out = np.empty(tri.shape[0], dtype=np.bool_)
+        for i in numba.prange(tri.shape[0]):
+            cx = (tri[i, 0, 0] + tri[i, 1, 0] + tri[i, 2, 0]) / 3.0
+            cy = (tri[i, 0, 1] + tri[i, 1, 1] + tri[i, 2, 1]) / 3.0
+            keep = (min_x <= cx <= max_x) and (min_y <= cy <= max_y)
+            if keep and use_z:
+                cz = (tri[i, 0, 2] + tri[i, 1, 2] + tri[i, 2, 2]) / 3.0
+                keep = min_z <= cz <= max_z
+            out[i] = keep
+        return out
+else:
+    _clip_mask = None
+
 
 class STLProcessor:
     """Process STL files for clipping and preview generation"""
@@ -21,10 +51,17 @@ class STLProcessor:
         self._bounds: Optional[Dict[str, float]] = None
     
     def load_mesh(self) -> bool:
-        """Load the STL mesh file"""
+        """Load the STL mesh file.
+
+        Idempotent: once the mesh is in memory, repeat calls return
+        immediately, so handlers can keep the call as a cheap guard.
+        """
+        if self._mesh is not None:
+            return True
+
         if not self.stl_path.exists():
             return False
-        
+
         try:
             self._mesh = mesh.Mesh.from_file(str(self.stl_path))
             self._calculate_bounds()
@@ -94,17 +131,25 @@ class STLProcessor:
         # Get all triangles
         triangles = self._mesh.vectors  # Shape: (n, 3, 3)
         
-        # Calculate centroid of each triangle
-        centroids = np.mean(triangles, axis=1)  # Shape: (n, 3)
-        
-        # Create mask for triangles within bounds
-        mask = (
-            (centroids[:, 0] >= min_x) & (centroids[:, 0] <= max_x) &
-            (centroids[:, 1] >= min_y) & (centroids[:, 1] <= max_y)
-        )
-        
-        if min_z is not None and max_z is not None:
-            mask &= (centroids[:, 2] >= min_z) & (centroids[:, 2] <= max_z)
+        use_z = min_z is not None and max_z is not None
+
+        if _clip_mask is not None:
+            mask = _clip_mask(
+                triangles, min_x, max_x, min_y, max_y,
+                min_z if use_z else 0.0, max_z if use_z else 0.0, use_z
+            )
+        else:
+            # Calculate centroid of each triangle
+            centroids = np.mean(triangles, axis=1)  # Shape: (n, 3)
+            
+            # Create mask for triangles within bounds
+            mask = (
+                (centroids[:, 0] >= min_x) & (centroids[:, 0] <= max_x) &
+                (centroids[:, 1] >= min_y) & (centroids[:, 1] <= max_y)
+            )
+            
+            if use_z:
+                mask &= (centroids[:, 2] >= min_z) & (centroids[:, 2] <= max_z)
         
         # Filter triangles
         filtered_triangles = triangles[mask]
@@ -121,25 +166,39 @@ class STLProcessor:
     def wgs84_to_local(self, lat: float, lng: float) -> Tuple[float, float]:
         """
         Convert WGS84 coordinates (lat/lng) to local STL coordinates.
-        
-        Uses parameters calibrated by matching STL building footprint 
+
+        Uses parameters calibrated by matching STL building footprint
         with OpenStreetMap tiles using OpenCV.
         """
         # Calibrated parameters from OpenCV map matching
         # Scale factors (STL units per degree)
         SCALE_X = 79491.5625
         SCALE_Y = 68407.5859
-        
+
         # Offsets (calculated from centroid alignment)
         OFFSET_X = -8226234.5000
         OFFSET_Y = -77697.3594
-        
-        # Linear transformation: 
+
+        # Linear transformation:
         # stl_x = SCALE_X * longitude + OFFSET_X
         # stl_y = SCALE_Y * latitude + OFFSET_Y
         x = SCALE_X * lng + OFFSET_X
         y = SCALE_Y * lat + OFFSET_Y
-        
+
+        return x, y
+
+    def wgs84_to_local_batch(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert arrays of WGS84 coordinates to local STL coordinates.
+
+        Same calibrated linear transform as wgs84_to_local, applied to
+        whole arrays so callers converting many points make one call
+        instead of a Python-level call per point.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        x = 79491.5625 * lngs + -8226234.5000
+        y = 68407.5859 * lats + -77697.3594
         return x, y
     
     def clip_by_geo_bounds(
@@ -175,18 +234,23 @@ class STLProcessor:
         
         return self.clip_by_bounds(min_x, max_x, min_y, max_y)
     
+    @functools.lru_cache(maxsize=32)
     def clip_by_district(
         self,
-        center_lat: float, 
+        center_lat: float,
         center_lng: float,
         radius_meters: float = 500
     ) -> Optional[mesh.Mesh]:
         """
         Clip mesh around a district center point with given radius.
-        
+
+        District centers and radii come from a small fixed table, so the
+        clip for a given (center, radius) is computed once and repeat
+        export jobs hit the cache. Callers must not mutate the result.
+
         Args:
             center_lat: District center latitude
-            center_lng: District center longitude  
+            center_lng: District center longitude
             radius_meters: Radius in meters around the center
         """
         if self._mesh is None:
@@ -257,11 +321,17 @@ class STLProcessor:
         
         return self.clip_by_bounds(min_x, max_x, min_y, max_y)
     
-    def mesh_to_json(self, target_mesh: Optional[mesh.Mesh] = None, simplify: bool = True, max_triangles: int = 5000) -> Dict[str, Any]:
+    def mesh_to_arrays(self, target_mesh: Optional[mesh.Mesh] = None, simplify: bool = True, max_triangles: int = 5000, normalize: bool = True) -> Dict[str, Any]:
         """
-        Convert mesh to JSON format for Three.js rendering.
-        
-        Returns vertices, normals, and indices for BufferGeometry.
+        Build preview geometry as contiguous float32 arrays.
+        
+        Same decimation, centering, and scaling as mesh_to_json, but
+        vertices and normals stay (n, 3) NumPy arrays so callers can
+        serialize them as binary payloads without list conversion.
+        With normalize=False the center/scale passes are skipped and
+        raw coordinates are returned (center [0,0,0], scale 1.0) for
+        clients that recenter on their side, e.g. via Three.js
+        geometry.center().
         """
         m = target_mesh if target_mesh is not None else self._mesh
         
@@ -296,63 +366,91 @@ class STLProcessor:
         normals = np.repeat(normals, 3, axis=0)
         
         # Center the mesh for preview
-        center = np.mean(vertices, axis=0)
-        vertices = vertices - center
-        
-        # Scale to fit in a unit cube
-        max_extent = np.max(np.abs(vertices))
-        if max_extent > 0:
-            vertices = vertices / max_extent * 0.8
+        center = [0.0, 0.0, 0.0]
+        max_extent = 0.0
+        if normalize:
+            mean = np.mean(vertices, axis=0)
+            vertices = vertices - mean
+            center = mean.tolist()
+            
+            # Scale to fit in a unit cube
+            max_extent = np.max(np.abs(vertices))
+            if max_extent > 0:
+                vertices = vertices / max_extent * 0.8
         
         return {
-            "vertices": vertices.flatten().tolist(),
-            "normals": normals.flatten().tolist(),
+            "vertices": np.ascontiguousarray(vertices, dtype=np.float32),
+            "normals": np.ascontiguousarray(normals, dtype=np.float32),
             "triangleCount": len(triangles),
             "originalTriangles": len(m.vectors),
-            "center": center.tolist(),
+            "center": center,
             "scale": float(max_extent) if max_extent > 0 else 1.0
         }
     
+    def mesh_to_json(self, target_mesh: Optional[mesh.Mesh] = None, simplify: bool = True, max_triangles: int = 5000) -> Dict[str, Any]:
+        """
+        Convert mesh to JSON format for Three.js rendering.
+        
+        Returns vertices, normals, and indices for BufferGeometry.
+        """
+        data = self.mesh_to_arrays(target_mesh, simplify=simplify, max_triangles=max_triangles)
+        if "error" in data:
+            return data
+        
+        data["vertices"] = data["vertices"].flatten().tolist()
+        data["normals"] = data["normals"].flatten().tolist()
+        return data
+    
     def mesh_to_binary_stl(self, target_mesh: Optional[mesh.Mesh] = None) -> bytes:
-        """Convert mesh to binary STL format"""
+        """Convert mesh to binary STL format.
+
+        Joins the chunked serializer, so normals come from the batched
+        cross/norm passes instead of a per-triangle Python loop.
+        """
         m = target_mesh if target_mesh is not None else self._mesh
         
         if m is None:
             return b''
         
-        # Create binary STL
-        buffer = io.BytesIO()
-        
-        # Header (80 bytes) - must be exactly 80 bytes
+        return b''.join(self.iter_binary_stl(m))
+
+    # Binary STL record: 12-byte normal, 3 vertices, 2-byte attribute
+    _STL_RECORD_DTYPE = np.dtype([
+        ('normal', '<f4', (3,)),
+        ('vertices', '<f4', (3, 3)),
+        ('attr', '<u2'),
+    ])
+
+    def iter_binary_stl(self, target_mesh: Optional[mesh.Mesh] = None, chunk_triangles: int = 20000):
+        """Yield a mesh as binary STL in bounded chunks.
+
+        Serializes chunk_triangles records at a time into a structured
+        array, so streaming a large clip never materializes the whole
+        file in memory the way mesh_to_binary_stl does.
+        """
+        m = target_mesh if target_mesh is not None else self._mesh
+
+        if m is None:
+            return
+
         header_text = b'Binary STL exported from SG 3D Export'
         header = header_text + b'\0' * (80 - len(header_text))
-        buffer.write(header)
-        
-        # Number of triangles
-        buffer.write(struct.pack('<I', len(m.vectors)))
-        
-        # Write each triangle
-        for i, triangle in enumerate(m.vectors):
-            # Calculate normal
-            v0, v1, v2 = triangle
-            edge1 = v1 - v0
-            edge2 = v2 - v0
-            normal = np.cross(edge1, edge2)
-            norm = np.linalg.norm(normal)
-            if norm > 0:
-                normal = normal / norm
-            
-            # Write normal
-            buffer.write(struct.pack('<3f', *normal))
-            
-            # Write vertices
-            for vertex in triangle:
-                buffer.write(struct.pack('<3f', *vertex))
-            
-            # Attribute byte count (unused)
-            buffer.write(struct.pack('<H', 0))
-        
-        return buffer.getvalue()
+        yield header + struct.pack('<I', len(m.vectors))
+
+        vectors = m.vectors
+        for start in range(0, len(vectors), chunk_triangles):
+            triangles = vectors[start:start + chunk_triangles]
+
+            edge1 = triangles[:, 1] - triangles[:, 0]
+            edge2 = triangles[:, 2] - triangles[:, 0]
+            normals = np.cross(edge1, edge2)
+            norms = np.linalg.norm(normals, axis=1, keepdims=True)
+            norms[norms == 0] = 1  # Avoid division by zero
+
+            records = np.zeros(len(triangles), dtype=self._STL_RECORD_DTYPE)
+            records['normal'] = normals / norms
+            records['vertices'] = triangles
+            yield records.tobytes()
 
 
 # Singleton instance
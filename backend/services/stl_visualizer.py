@@ -2,7 +2,6 @@
 STL Visualizer - Generate 2D projections for coordinate verification
 """
 import numpy as np
-from stl import mesh
 from pathlib import Path
 from typing import Optional, Tuple, List
 import base64
@@ -16,6 +15,7 @@ except ImportError:
     HAS_PIL = False
 
 from config import settings
+from services.mesh_cache import load_mesh, fit_projection, project_batch
 
 
 def generate_topdown_image(
@@ -45,45 +45,35 @@ def generate_topdown_image(
     if not stl_path.exists():
         return None
     
-    # Load mesh
-    stl_mesh = mesh.Mesh.from_file(str(stl_path))
-    
-    # Get all vertices
-    vertices = stl_mesh.vectors.reshape(-1, 3)
-    
-    # Get bounds
-    min_x, max_x = np.min(vertices[:, 0]), np.max(vertices[:, 0])
-    min_y, max_y = np.min(vertices[:, 1]), np.max(vertices[:, 1])
-    
-    # Create image
-    img = Image.new('RGB', (width, height), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    # Calculate scale
+    # Load mesh (memoized per path+mtime)
+    view = load_mesh(stl_path)
+    vectors = view.vectors
+
+    # Get bounds and the centered fit into the frame
+    min_x, max_x, min_y, max_y = view.vertex_bounds
     margin = 40
-    scale_x = (width - 2 * margin) / (max_x - min_x)
-    scale_y = (height - 2 * margin) / (max_y - min_y)
-    scale = min(scale_x, scale_y)
-    
-    # Offset to center
-    offset_x = margin + (width - 2 * margin - (max_x - min_x) * scale) / 2
-    offset_y = margin + (height - 2 * margin - (max_y - min_y) * scale) / 2
-    
+    projection = fit_projection(view.vertex_bounds, width, height, margin)
+
     def to_image_coords(x, y):
-        ix = offset_x + (x - min_x) * scale
-        iy = height - (offset_y + (y - min_y) * scale)  # Flip Y
+        ix, iy = project_batch(x, y, view.vertex_bounds, projection, height)
         return int(ix), int(iy)
-    
-    # Draw triangles (simplified - just draw points for speed)
-    # Sample every Nth point for performance
-    sample_rate = max(1, len(vertices) // 50000)
-    sampled = vertices[::sample_rate]
-    
-    for v in sampled:
-        ix, iy = to_image_coords(v[0], v[1])
-        if 0 <= ix < width and 0 <= iy < height:
-            draw.point((ix, iy), fill='gray')
-    
+
+    # Draw filled triangle footprints rather than isolated vertex dots:
+    # proper coverage at a fraction of the old 50k draw.point calls.
+    # The sample is seeded so repeat renders (and cached PNGs) are
+    # byte-identical; projection to pixel coordinates is one vectorized
+    # pass, leaving only PIL's C scanline fill per triangle
+    sample_size = min(20000, len(vectors))
+    rng = np.random.default_rng(0)
+    tris = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+    px, py = project_batch(tris[:, :, 0], tris[:, :, 1], view.vertex_bounds, projection, height)
+    coords = np.stack([px, py], axis=-1).reshape(sample_size, 6).tolist()
+
+    img = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(img)
+    for tri in coords:
+        draw.polygon(tri, fill='gray')
+
     # Draw boundary
     draw.rectangle([margin-5, margin-5, width-margin+5, height-margin+5], outline='black', width=2)
     
@@ -105,7 +95,10 @@ def generate_topdown_image(
     
     # Save to bytes
     buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
+    # compress_level=1: zlib level 6 dominates the encode cost for
+    # these throwaway diagnostics; level 1 encodes ~3x faster for a
+    # marginally larger payload
+    img.save(buffer, format='PNG', compress_level=1, optimize=False)
     return buffer.getvalue()
 
 
@@ -126,52 +119,48 @@ def generate_density_heatmap(
     if not stl_path.exists():
         return None
     
-    # Load mesh
-    stl_mesh = mesh.Mesh.from_file(str(stl_path))
-    
-    # Get triangle centroids
-    triangles = stl_mesh.vectors
-    centroids = np.mean(triangles, axis=1)
-    
+    # Load mesh (memoized per path+mtime)
+    view = load_mesh(stl_path)
+    centroids = view.centroids
+
     # Get bounds
-    min_x, max_x = np.min(centroids[:, 0]), np.max(centroids[:, 0])
-    min_y, max_y = np.min(centroids[:, 1]), np.max(centroids[:, 1])
-    
-    # Create density grid
-    density = np.zeros((grid_size, grid_size))
-    
-    for c in centroids:
-        gx = int((c[0] - min_x) / (max_x - min_x) * (grid_size - 1))
-        gy = int((c[1] - min_y) / (max_y - min_y) * (grid_size - 1))
-        gx = max(0, min(grid_size - 1, gx))
-        gy = max(0, min(grid_size - 1, gy))
-        density[gy, gx] += 1
+    min_x, max_x, min_y, max_y = view.centroid_bounds
+    
+    # Create density grid: map every centroid to its cell in one
+    # vectorized pass and count with bincount, keeping the exact
+    # truncate-and-clamp binning of the old per-centroid loop
+    gx = ((centroids[:, 0] - min_x) / (max_x - min_x) * (grid_size - 1)).astype(np.int64)
+    gy = ((centroids[:, 1] - min_y) / (max_y - min_y) * (grid_size - 1)).astype(np.int64)
+    np.clip(gx, 0, grid_size - 1, out=gx)
+    np.clip(gy, 0, grid_size - 1, out=gy)
+    density = np.bincount(
+        gy * grid_size + gx, minlength=grid_size * grid_size
+    ).reshape(grid_size, grid_size).astype(np.float64)
     
     # Normalize
     density = density / np.max(density) if np.max(density) > 0 else density
     
-    # Create heatmap image
-    img = Image.new('RGB', (width, height), color='white')
-    
+    # Create heatmap image: build the white-to-red cell colors as one
+    # uint8 array, expand each cell to pixel size with two repeats, and
+    # blit — replaces grid_size^2 draw.rectangle calls
     cell_w = (width - 80) // grid_size
     cell_h = (height - 80) // grid_size
-    
-    for gy in range(grid_size):
-        for gx in range(grid_size):
-            val = density[gy, gx]
-            # Color from white to red
-            r = 255
-            g = int(255 * (1 - val))
-            b = int(255 * (1 - val))
-            
-            x1 = 40 + gx * cell_w
-            y1 = 40 + (grid_size - 1 - gy) * cell_h  # Flip Y
-            x2 = x1 + cell_w
-            y2 = y1 + cell_h
-            
-            draw = ImageDraw.Draw(img)
-            draw.rectangle([x1, y1, x2, y2], fill=(r, g, b))
-    
+
+    fade = (255 * (1 - density)).astype(np.uint8)
+    cells = np.stack([np.full_like(fade, 255), fade, fade], axis=-1)
+    cells = cells[::-1]  # Flip Y
+    pixels = np.repeat(np.repeat(cells, cell_h, axis=0), cell_w, axis=1)
+
+    # Single canvas: write the heatmap cells straight into the full
+    # frame and hand the buffer to PIL once, instead of building an
+    # intermediate Image and pasting it
+    canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+    canvas[40:40 + pixels.shape[0], 40:40 + pixels.shape[1]] = pixels
+    img = Image.fromarray(canvas)
+
     buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
+    # compress_level=1: zlib level 6 dominates the encode cost for
+    # these throwaway diagnostics; level 1 encodes ~3x faster for a
+    # marginally larger payload
+    img.save(buffer, format='PNG', compress_level=1, optimize=False)
     return buffer.getvalue()
@@ -1,17 +1,17 @@
 #!/usr/bin/env python3
 """Verify clipping by generating a visualization of clipped area"""
 import numpy as np
-from stl import mesh
+from pathlib import Path
 from PIL import Image, ImageDraw
 
-# Load STL
+from services.mesh_cache import load_mesh, fit_projection, project_batch
+
+# Load STL (shared cache: vectors, centroids and bounds in one call)
 print("Loading STL file...")
-stl_mesh = mesh.Mesh.from_file('../sg-building-binary.stl')
-vertices = stl_mesh.vectors.reshape(-1, 3)
-triangles = stl_mesh.vectors
+view = load_mesh(Path('../sg-building-binary.stl'))
+triangles = view.vectors
 
-min_x, max_x = np.min(vertices[:, 0]), np.max(vertices[:, 0])
-min_y, max_y = np.min(vertices[:, 1]), np.max(vertices[:, 1])
+min_x, max_x, min_y, max_y = view.vertex_bounds
 
 print(f"STL bounds: X({min_x:.1f}, {max_x:.1f}), Y({min_y:.1f}, {max_y:.1f})")
 
@@ -37,55 +37,74 @@ locations = {
 
 # Create visualization
 width, height = 1200, 900
-img = Image.new('RGB', (width, height), 'white')
-draw = ImageDraw.Draw(img)
 
 margin = 50
-scale_x = (width - 2 * margin) / (max_x - min_x)
-scale_y = (height - 2 * margin) / (max_y - min_y)
-scale = min(scale_x, scale_y)
+projection = fit_projection(view.vertex_bounds, width, height, margin)
 
 def to_img(x, y):
-    ix = margin + (x - min_x) * scale
-    iy = height - margin - (y - min_y) * scale
+    ix, iy = project_batch(x, y, view.vertex_bounds, projection, height)
     return int(ix), int(iy)
 
 # Draw all triangles (sampled)
 print("Drawing triangles...")
-centroids = np.mean(triangles, axis=1)
-sample_rate = max(1, len(centroids) // 30000)
-for c in centroids[::sample_rate]:
-    ix, iy = to_img(c[0], c[1])
-    if 0 <= ix < width and 0 <= iy < height:
-        draw.point((ix, iy), fill='lightgray')
+centroids = view.centroids
+# Seeded uniform sample rather than a stride, which aliases against
+# the order buildings were written in
+rng = np.random.default_rng(0)
+sample_size = min(30000, len(centroids))
+pts = centroids[rng.choice(len(centroids), size=sample_size, replace=False)]
+# One vectorized scatter into a uint8 canvas instead of a draw.point
+# call per sampled centroid
+ix, iy = project_batch(pts[:, 0], pts[:, 1], view.vertex_bounds, projection, height)
+in_frame = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+canvas[iy[in_frame], ix[in_frame]] = (211, 211, 211)  # lightgray
+
+img = Image.fromarray(canvas)
+draw = ImageDraw.Draw(img)
 
 # Draw clip regions for each location
 colors = {'Marina Bay/CBD': 'red', 'One North': 'cyan', 'NUS': 'magenta', 'NTU': 'brown'}
 radii = {'Marina Bay/CBD': 800, 'One North': 600, 'NUS': 1200, 'NTU': 2000}
 
 print("\nClip regions:")
-for name, (lat, lng) in locations.items():
-    cx, cy = wgs84_to_stl(lat, lng)
-    
-    # Calculate radius in STL units using OpenCV calibrated scale
-    meters_per_deg_lng = 111320 * np.cos(np.radians(lat))
-    meters_per_deg_lat = 111320
-    stl_per_meter_x = SCALE_X / meters_per_deg_lng
-    stl_per_meter_y = SCALE_Y / meters_per_deg_lat
-    stl_per_meter = (stl_per_meter_x + stl_per_meter_y) / 2
-    
-    radius_m = radii.get(name, 600)
-    radius_stl = radius_m * stl_per_meter
-    
+
+# Resolve every region's center and radius in one vectorized pass.
+# float32 keeps the broadcast dx/dy arrays below at the centroids'
+# own precision instead of promoting every element to float64
+names = list(locations)
+lats = np.array([locations[n][0] for n in names], dtype=np.float32)
+lngs = np.array([locations[n][1] for n in names], dtype=np.float32)
+region_cx, region_cy = wgs84_to_stl(lats, lngs)
+
+# Radii in STL units using the OpenCV calibrated scale
+meters_per_deg_lng = 111320 * np.cos(np.radians(lats))
+meters_per_deg_lat = 111320
+stl_per_meter = (SCALE_X / meters_per_deg_lng + SCALE_Y / meters_per_deg_lat) / 2
+region_r = np.array(
+    [radii.get(n, 600) for n in names], dtype=np.float32
+) * stl_per_meter
+
+# Count triangles per region with a coarse-then-fine query: one
+# x-argsort amortizes over all regions, searchsorted slices out just
+# the centroids inside each region's x-extent, and only that slice
+# pays the exact squared-distance test. Far-away centroids are never
+# read at all
+order = np.argsort(centroids[:, 0], kind='stable')
+sorted_x = centroids[order, 0]
+sorted_y = centroids[order, 1]
+counts = np.empty(len(names), dtype=np.int64)
+for i in range(len(names)):
+    lo = np.searchsorted(sorted_x, region_cx[i] - region_r[i], side='left')
+    hi = np.searchsorted(sorted_x, region_cx[i] + region_r[i], side='right')
+    dx = sorted_x[lo:hi] - region_cx[i]
+    dy = sorted_y[lo:hi] - region_cy[i]
+    counts[i] = np.count_nonzero(dx * dx + dy * dy <= region_r[i] * region_r[i])
+
+for i, name in enumerate(names):
+    cx, cy, radius_stl = region_cx[i], region_cy[i], region_r[i]
     print(f"  {name}: center=({cx:.0f}, {cy:.0f}), radius={radius_stl:.0f} STL units")
-    
-    # Count triangles in region
-    in_region = ((centroids[:, 0] >= cx - radius_stl) & 
-                 (centroids[:, 0] <= cx + radius_stl) &
-                 (centroids[:, 1] >= cy - radius_stl) & 
-                 (centroids[:, 1] <= cy + radius_stl))
-    count = np.sum(in_region)
-    print(f"         triangles in region: {count}")
+    print(f"         triangles in region: {counts[i]}")
     
     # Draw clip region
     color = colors.get(name, 'blue')